@@ -0,0 +1,130 @@
+"""
+Import-time budget check for the Streamlit pages.
+
+For every page under src/pages/ this collects the imports that run
+unconditionally at the top of the script (before any st.stop() can return
+early) and times them in a fresh interpreter, so nothing is shared with a
+warm module cache. It also checks that importing src.database.utils does not
+open the production database.
+
+Pages that import `db_ops` open the database. The children point db_folder
+at a temporary folder, so the real prod.db is never touched, and the
+database is created and migrated once up front and reported on its own
+line; the page timings only include opening the up-to-date database.
+
+Usage:
+    python benchmarks/import_budget.py [--budget SECONDS]
+
+Exits non-zero when any page goes over budget.
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PAGES_DIR = REPO_ROOT / "src" / "pages"
+
+# Generous enough for a cold laptop start; the point is to catch a heavy
+# module (pandas, plotly, matplotlib) creeping back into the eager imports.
+DEFAULT_BUDGET_SECONDS = 1.5
+
+_TIMER = """
+import json, sys, time
+start = time.perf_counter()
+import src.database.utils as _utils
+_utils.db_folder = {db_folder!r}
+{imports}
+print(json.dumps({{"seconds": time.perf_counter() - start, "modules": len(sys.modules)}}))
+"""
+
+_DB_BOOTSTRAP = """
+import json, sys
+import src.database.utils as utils
+utils.db_folder = {db_folder!r}
+modules = len(sys.modules)
+import time
+start = time.perf_counter()
+utils.get_db_ops()
+print(json.dumps({{"seconds": time.perf_counter() - start, "modules": len(sys.modules) - modules}}))
+"""
+
+_NO_DB_ON_IMPORT = """
+import json, sys
+import src.database.utils as utils
+print(json.dumps({"db_opened": utils._db_ops is not None}))
+"""
+
+
+def _stops_early(node: ast.stmt) -> bool:
+    """True for a top-level `if` whose body calls st.stop()."""
+    return isinstance(node, ast.If) and any(
+        isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute) and child.func.attr == "stop"
+        for statement in node.body
+        for child in ast.walk(statement)
+    )
+
+
+def eager_imports(page: Path) -> list[str]:
+    """Source of the top-level imports a page runs before its first early exit."""
+    source = page.read_text(encoding="utf-8")
+    statements = []
+    for node in ast.parse(source).body:
+        if _stops_early(node):
+            break
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            statements.append(ast.get_source_segment(source, node))
+    return statements
+
+
+def _run(code: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def time_db_bootstrap(db_folder: str) -> dict:
+    """Create and migrate an empty database in `db_folder`, as the first page import on a fresh install does."""
+    return _run(_DB_BOOTSTRAP.format(db_folder=db_folder))
+
+
+def time_page(page: Path, db_folder: str) -> dict:
+    imports = eager_imports(page)
+    result = _run(_TIMER.format(imports="\n".join(imports), db_folder=db_folder))
+    result["imports"] = imports
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="seconds allowed per page")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    if _run(_NO_DB_ON_IMPORT)["db_opened"]:
+        print("FAIL importing src.database.utils opened the production database")
+        failures += 1
+
+    with tempfile.TemporaryDirectory() as db_folder:
+        result = time_db_bootstrap(db_folder)
+        print(f"{'':4} {'(database bootstrap)':28} {result['seconds'] * 1000:8.1f} ms  {result['modules']:5} modules")
+
+        for page in sorted(PAGES_DIR.glob("*.py")):
+            result = time_page(page, db_folder)
+            status = "ok" if result["seconds"] <= args.budget else "OVER"
+            failures += status == "OVER"
+            print(f"{status:4} {page.name:28} {result['seconds'] * 1000:8.1f} ms  {result['modules']:5} modules")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
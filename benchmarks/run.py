@@ -0,0 +1,289 @@
+"""
+Timed DbOps and page data-loading scenarios over a synthetic database.
+
+Usage:
+    python benchmarks/run.py [--habits N] [--years Y] [--accounts M] [--transactions K]
+                             [--repeat R] [--output results.json] [--compare baseline.json]
+
+A fresh SQLite file is generated in a temporary directory for every run.
+Results are written as JSON (median/min seconds per scenario plus the spec
+and git commit), and --compare reports scenarios that got slower than a
+previous results file by more than --threshold.
+"""
+import argparse
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.synthetic import SyntheticData, SyntheticSpec, generate  # noqa: E402
+from src.database import utils  # noqa: E402
+from src.database.utils import DbOps, Skill  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Several <STMTTRN> blocks on a single line, as some banks export OFX
+ONE_LINE_OFX = REPO_ROOT / "benchmarks" / "fixtures" / "one_line_statement.ofx"
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    run: Callable[[], object]
+    # Read scenarios start from a cold session so the identity map does not hide query cost
+    cold: bool = True
+    # Runs untimed before every repetition
+    setup: Callable[[], object] | None = None
+
+
+def build_scenarios(db_ops: DbOps, data: SyntheticData) -> list[Scenario]:
+    from src.database.habit_analytics import correlate_habits, habit_matrix_from_series, load_habit_matrix, score_habits
+    from src.database.importer import import_statement_file
+    from src.database.snapshots import MANIFEST_NAME
+
+    habit_id = data.habit_ids[0]
+    account_id = data.account_ids[0]
+    last_day = data.end_date
+    last_year = last_day.replace(day=1) - timedelta(days=365)
+    counter = iter(range(10**9))
+
+    def page_habit_log():
+        db_ops.list_all_habits()
+        db_ops.get_habit_logs_for_day(last_day)
+
+    def page_habit_dashboard():
+        import pandas as pd
+
+        habit = next(habit for habit in db_ops.list_all_habits() if habit.id == habit_id)
+        dates, values = db_ops.habit_log_arrays(habit_id)
+        pd.DataFrame({"Date": pd.to_datetime(dates), "Value": values})
+        db_ops.get_habit_rollups(habit_id, "MONTH")
+        score_habits(habit_matrix_from_series(habit, dates, values))
+
+    def page_habit_correlations():
+        db_ops.list_all_habits()
+        correlate_habits(load_habit_matrix(db_ops, start=last_day - timedelta(days=365), end=last_day), max_lag=3)
+
+    def page_transactions():
+        db_ops.list_accounts()
+        page = db_ops.list_transactions_page(limit=50)
+        [(txn.account.name, [tag.name for tag in txn.tags]) for txn in page]
+
+    def page_accounts():
+        db_ops.list_accounts()
+        db_ops.balance_series(account_id, last_day - timedelta(days=180), last_day)
+
+    def page_spending():
+        db_ops.list_accounts()
+        db_ops.spending_by_month(last_year, last_day, "tag")
+        db_ops.list_tags()
+        db_ops.budget_vs_actual(last_day)
+
+    def page_search():
+        page = db_ops.search("merchant 4", limit=20)
+        [(result.kind, result.title, result.snippet) for result in page.results]
+
+    def write_habit_logs():
+        day = last_day + timedelta(days=next(counter) + 1)
+        db_ops.add_habit_logs(day, {h: 1.0 for h in data.habit_ids})
+
+    snapshot_dir = Path(utils.db_folder) / "snapshots"
+
+    def change_one_snapshot_partition():
+        if not (snapshot_dir / MANIFEST_NAME).exists():
+            db_ops.export_snapshots(snapshot_dir, full=True)
+        # One habit log on an already exported day marks a single month partition
+        db_ops.add_habit_logs(last_day, {habit_id: float(next(counter) % 2)})
+
+    def add_tasks_batched():
+        with db_ops.batch(refresh=False):
+            for _ in range(100):
+                db_ops.add_task(f"bench-{next(counter)}", "", 10, last_day)
+
+    skill = db_ops.db.get(Skill, "synthetic-skill")
+
+    return [
+        # Reads
+        Scenario("list_all_habits", db_ops.list_all_habits),
+        Scenario("get_all_goals", db_ops.get_all_goals),
+        Scenario("list_accounts", db_ops.list_accounts),
+        Scenario("list_tags", db_ops.list_tags),
+        Scenario("list_grinds", db_ops.list_grinds),
+        Scenario("list_xp_progressions", db_ops.list_xp_progressions),
+        Scenario("list_tasks", db_ops.list_tasks),
+        Scenario("list_overdue_tasks", lambda: db_ops.list_overdue_tasks(today=last_day, limit=50)),
+        Scenario("list_tasks_due_today", lambda: db_ops.list_tasks_due_today(today=last_day)),
+        Scenario("list_upcoming_tasks", lambda: db_ops.list_upcoming_tasks(7, today=last_day, limit=50)),
+        Scenario("task_agenda", lambda: db_ops.task_agenda(7, today=last_day, limit=50)),
+        Scenario("list_transactions", db_ops.list_transactions),
+        Scenario("list_transactions_page", lambda: db_ops.list_transactions_page(limit=50)),
+        Scenario("get_habit_logs_for_day", lambda: db_ops.get_habit_logs_for_day(last_day)),
+        Scenario("get_habit_logs_by_habit", lambda: db_ops.get_habit_logs_by_habit(habit_id)),
+        Scenario("habit_log_arrays", lambda: db_ops.habit_log_arrays(habit_id)),
+        Scenario("stream_habit_logs", lambda: sum(len(chunk) for chunk in db_ops.stream_habit_logs(habit_id))),
+        Scenario("get_habit_rollups", lambda: db_ops.get_habit_rollups(habit_id, "MONTH")),
+        Scenario("get_subtree", lambda: db_ops.get_subtree(data.root_goal_ids[0])),
+        Scenario("get_ancestors", lambda: db_ops.get_ancestors(data.leaf_goal_ids[0])),
+        Scenario("goal_progress", db_ops.goal_progress),
+        Scenario("balance_as_of", lambda: db_ops.balance_as_of(account_id, last_day - timedelta(days=400))),
+        Scenario("balance_series_180d", lambda: db_ops.balance_series(account_id, last_day - timedelta(days=180), last_day)),
+        Scenario("habit_matrix_all", lambda: score_habits(load_habit_matrix(db_ops))),
+        Scenario("list_budgets", db_ops.list_budgets),
+        Scenario("spending_by_month_tag", lambda: db_ops.spending_by_month(last_year, last_day, "tag")),
+        Scenario("spending_by_month_account", lambda: db_ops.spending_by_month(last_year, last_day, "account")),
+        Scenario("spending_by_month_total_all_time", lambda: db_ops.spending_by_month(data.start_date, last_day, None)),
+        Scenario("budget_vs_actual", lambda: db_ops.budget_vs_actual(last_day)),
+        Scenario("search_word", lambda: db_ops.search("merchant", limit=20)),
+        Scenario("search_prefix_two_words", lambda: db_ops.search("merch 4", limit=20)),
+        Scenario("search_page_10", lambda: db_ops.search("merchant", limit=20, offset=200)),
+        Scenario("search_tasks_only", lambda: db_ops.search("task", ["task"], limit=20)),
+        # Writes
+        Scenario("add_habit_logs_all_habits", write_habit_logs, cold=False),
+        Scenario("create_habit", lambda: db_ops.create_habit(f"bench-{next(counter)}", "", False, False, 1.0, "x", 1), cold=False),
+        Scenario("create_goal", lambda: db_ops.create_goal(f"bench-{next(counter)}", "", last_day), cold=False),
+        Scenario("add_task", lambda: db_ops.add_task(f"bench-{next(counter)}", "", 10, last_day), cold=False),
+        Scenario("add_tasks_batched_100", add_tasks_batched, cold=False),
+        Scenario("add_account", lambda: db_ops.add_account(f"bench-{next(counter)}", 0.0, "checking"), cold=False),
+        Scenario("add_grind", lambda: db_ops.add_grind(f"bench-{next(counter)}", skill, "", "LINEAR", 100.0, 1.0), cold=False),
+        Scenario("create_xp_progression", lambda: db_ops.create_xp_progression("EXPONENTIAL", 100.0, 1.5), cold=False),
+        Scenario("award_xp", lambda: db_ops.award_xp(db_ops.list_xp_progressions()[0].id, 5), cold=False),
+        Scenario("update_xp_progression", lambda: db_ops.update_xp_progression(
+            db_ops.list_xp_progressions()[0].id, 1000 + next(counter)), cold=False),
+        Scenario("mark_task_completed", lambda: db_ops.mark_task_completed(data.open_task_ids.pop()), cold=False),
+        Scenario("generate_recurring_tasks", lambda: db_ops.generate_recurring_tasks(28, start=last_day), cold=False),
+        Scenario("complete_tasks_20", lambda: db_ops.complete_tasks([data.open_task_ids.pop() for _ in range(20)]), cold=False),
+        Scenario("create_transaction", lambda: db_ops.create_transaction(
+            db_ops.db.get(utils.Account, account_id), 12.5, last_day, "bench", ["food", "bench"]), cold=False),
+        Scenario("set_budget", lambda: db_ops.set_budget(f"bench-{next(counter)}", 100.0), cold=False),
+        Scenario("import_ofx_one_line", lambda: import_statement_file(db_ops, account_id, ONE_LINE_OFX), cold=False),
+        Scenario("rebuild_habit_rollups", db_ops.rebuild_habit_rollups, cold=False),
+        Scenario("rebuild_balance_checkpoints", db_ops.rebuild_balance_checkpoints, cold=False),
+        Scenario("rebuild_search_index", db_ops.rebuild_search_index, cold=False),
+        Scenario("export_snapshots_full", lambda: db_ops.export_snapshots(snapshot_dir, full=True), cold=False),
+        Scenario("export_snapshots_incremental", lambda: db_ops.export_snapshots(snapshot_dir),
+                 cold=False, setup=change_one_snapshot_partition),
+        # Page data loading
+        Scenario("page_habit_log", page_habit_log),
+        Scenario("page_habit_dashboard", page_habit_dashboard),
+        Scenario("page_habit_correlations", page_habit_correlations),
+        Scenario("page_transactions", page_transactions),
+        Scenario("page_accounts", page_accounts),
+        Scenario("page_spending", page_spending),
+        Scenario("page_search", page_search),
+    ]
+
+
+def time_scenario(db_ops: DbOps, scenario: Scenario, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        if scenario.setup is not None:
+            scenario.setup()
+        if scenario.cold:
+            db_ops.remove_session()
+            db_ops.query_cache.clear()
+        start = time.perf_counter()
+        scenario.run()
+        timings.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "max_s": max(timings),
+        "repeat": repeat,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Names of scenarios whose median grew by more than `threshold` (a fraction)."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        ratio = current["median_s"] / previous["median_s"] if previous["median_s"] else 1.0
+        marker = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:32} {previous['median_s'] * 1000:10.2f} ms -> {current['median_s'] * 1000:10.2f} ms  x{ratio:5.2f} {marker}")
+        if marker:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--habits", type=int, default=SyntheticSpec.habits)
+    parser.add_argument("--years", type=int, default=SyntheticSpec.years)
+    parser.add_argument("--accounts", type=int, default=SyntheticSpec.accounts)
+    parser.add_argument("--transactions", type=int, default=SyntheticSpec.transactions_per_account, help="per account")
+    parser.add_argument("--goal-trees", type=int, default=SyntheticSpec.goal_trees)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--compare", type=Path, help="previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before flagging, as a fraction")
+    args = parser.parse_args(argv)
+
+    spec = SyntheticSpec(
+        habits=args.habits,
+        years=args.years,
+        accounts=args.accounts,
+        transactions_per_account=args.transactions,
+        goal_trees=args.goal_trees,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        utils.db_folder = tmp
+        db_ops = DbOps("benchmark.db")
+
+        start = time.perf_counter()
+        data = generate(db_ops, spec, seed=args.seed)
+        generate_s = time.perf_counter() - start
+        print(f"Generated synthetic data in {generate_s:.1f} s")
+
+        results = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "spec": spec.as_dict(),
+            "seed": args.seed,
+            "generate_s": generate_s,
+            "scenarios": {},
+        }
+        for scenario in build_scenarios(db_ops, data):
+            if args.only and scenario.name not in args.only:
+                continue
+            results["scenarios"][scenario.name] = timing = time_scenario(db_ops, scenario, args.repeat)
+            print(f"{scenario.name:32} {timing['median_s'] * 1000:10.2f} ms")
+
+        db_ops.remove_session()
+        utils.get_engine(f"sqlite:///{tmp}/benchmark.db").dispose()
+
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
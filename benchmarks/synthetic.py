@@ -0,0 +1,151 @@
+"""
+Deterministic synthetic data for benchmarking DbOps.
+
+The same SyntheticSpec and seed always produce the same habits, logs,
+accounts, transactions, budgets, goals and tasks (only the generated UUIDs differ),
+so timings from different commits are comparable.
+"""
+import logging
+logger = logging.getLogger(__name__)
+
+import random
+from dataclasses import asdict, dataclass, field
+from datetime import date, timedelta
+
+from src.database.importer import StatementLine, import_statement
+from src.database.utils import DbOps, Skill
+
+TAG_NAMES = ["food", "rent", "travel", "fun", "health", "bills", "gifts", "work", "books", "transport"]
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    habits: int = 50
+    years: int = 3
+    log_fill_rate: float = 0.8  # fraction of days each habit is logged
+    accounts: int = 5
+    transactions_per_account: int = 5000
+    max_tags_per_transaction: int = 3
+    budgets: int = 5  # tags with a monthly limit, at most len(TAG_NAMES)
+    goal_trees: int = 5
+    goal_depth: int = 4
+    goal_fanout: int = 3
+    tasks_per_goal: int = 4
+    grinds: int = 5
+    end_date: date = field(default=date(2025, 12, 31))
+
+    def as_dict(self) -> dict:
+        spec = asdict(self)
+        spec["end_date"] = self.end_date.isoformat()
+        return spec
+
+
+@dataclass
+class SyntheticData:
+    """Ids of the generated rows, for scenarios that need concrete targets."""
+    habit_ids: list[str] = field(default_factory=list)
+    account_ids: list[str] = field(default_factory=list)
+    root_goal_ids: list[str] = field(default_factory=list)
+    leaf_goal_ids: list[str] = field(default_factory=list)
+    grind_ids: list[str] = field(default_factory=list)
+    open_task_ids: list[str] = field(default_factory=list)
+    start_date: date | None = None
+    end_date: date | None = None
+
+
+def generate(db_ops: DbOps, spec: SyntheticSpec = SyntheticSpec(), seed: int = 0) -> SyntheticData:
+    """Populate an empty database according to `spec`."""
+    rng = random.Random(seed)
+    data = SyntheticData(end_date=spec.end_date, start_date=spec.end_date - timedelta(days=365 * spec.years - 1))
+    days = [data.start_date + timedelta(days=offset) for offset in range((data.end_date - data.start_date).days + 1)]
+
+    # Habits: a mix of binary/numeric and positive/negative, with varied target periods
+    habits = []
+    with db_ops.batch(refresh=False):
+        for index in range(spec.habits):
+            is_binary = rng.random() < 0.5
+            is_negative = rng.random() < 0.2
+            habits.append(db_ops.create_habit(
+                name=f"habit-{index:04d}",
+                description=f"Synthetic habit {index}",
+                is_binary_habit=is_binary,
+                is_negative_habit=is_negative,
+                target_frequency_value=0.0 if is_negative else rng.choice([1.0, 3.0, 5.0, 30.0]),
+                target_frequency_unit="times",
+                target_period_in_days=rng.choice([1, 7, 7, 30]),
+            ))
+    data.habit_ids = [habit.id for habit in habits]
+
+    for month_start in range(0, len(days), 31):
+        logs_by_date = {}
+        for day in days[month_start:month_start + 31]:
+            logs_by_date[day] = {
+                habit.id: (float(rng.random() < 0.7) if habit.is_binary_habit else round(rng.uniform(0, 10), 2))
+                for habit in habits
+                if rng.random() < spec.log_fill_rate
+            }
+        db_ops.upsert_habit_logs(logs_by_date)
+    logger.info("Generated %s habits over %s days", spec.habits, len(days))
+
+    # Accounts with tagged transactions, loaded through the bulk importer
+    for index in range(spec.accounts):
+        account = db_ops.add_account(f"account-{index:02d}", round(rng.uniform(0, 10_000), 2), rng.choice(["checking", "savings", "credit"]))
+        data.account_ids.append(account.id)
+        lines = (
+            StatementLine(
+                txn_date=rng.choice(days),
+                amount=round(rng.uniform(-200, 500), 2),
+                description=f"merchant {rng.randrange(500)}",
+                tag_names=tuple(rng.sample(TAG_NAMES, rng.randint(0, spec.max_tags_per_transaction))),
+            )
+            for _ in range(spec.transactions_per_account)
+        )
+        import_statement(db_ops, account.id, lines)
+    logger.info("Generated %s accounts x %s transactions", spec.accounts, spec.transactions_per_account)
+
+    # Monthly limits on the first tags
+    with db_ops.batch(refresh=False):
+        for tag_name in TAG_NAMES[:spec.budgets]:
+            db_ops.set_budget(tag_name, float(rng.choice([100, 250, 500, 1000])))
+
+    # Grinds with XP progressions
+    skill = Skill(id="synthetic-skill", name="Synthetic", description="", xp_progression_id=None)
+    with db_ops.batch(refresh=False):
+        db_ops.db.merge(skill)
+        for index in range(spec.grinds):
+            grind = db_ops.add_grind(f"grind-{index}", skill, "", rng.choice(["LINEAR", "EXPONENTIAL"]), 100.0, 1.5)
+            data.grind_ids.append(grind.id)
+
+    # Goal trees with tasks on every goal
+    def build(parent, depth: int):
+        goal = db_ops.create_goal(
+            name=f"goal-d{depth}-{rng.randrange(10**6)}",
+            description="Synthetic goal",
+            due_date=rng.choice(days),
+            parent_goal=parent,
+        )
+        for task_index in range(spec.tasks_per_goal):
+            task = db_ops.add_task(
+                title=f"task {task_index} of {goal.name}",
+                description="Synthetic task",
+                xp=rng.choice([5, 10, 25, 50]),
+                due_date=rng.choice(days),
+                is_completed=rng.random() < 0.4,
+                goal_id=goal.id,
+                grind_id=rng.choice(data.grind_ids) if data.grind_ids else None,
+            )
+            if not task.is_completed:
+                data.open_task_ids.append(task.id)
+        if depth + 1 < spec.goal_depth:
+            for _ in range(spec.goal_fanout):
+                build(goal, depth + 1)
+        else:
+            data.leaf_goal_ids.append(goal.id)
+        return goal
+
+    with db_ops.batch(refresh=False):
+        for _ in range(spec.goal_trees):
+            data.root_goal_ids.append(build(None, 0).id)
+    logger.info("Generated %s goal trees of depth %s", spec.goal_trees, spec.goal_depth)
+
+    return data
@@ -0,0 +1,305 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import asyncio
+import contextvars
+import functools
+import threading
+from datetime import date
+from typing import Any, Awaitable, Coroutine, Iterable, Sequence
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+
+from src.database.instrumentation import instrument_engine
+from src.database.utils import (
+    POOL_MAX_OVERFLOW,
+    POOL_SIZE,
+    PROD_DB_NAME,
+    Account,
+    DbOps,
+    Goal,
+    Grind,
+    Habit,
+    HabitLog,
+    HabitRollup,
+    Tag,
+    Task,
+    Transaction,
+    XPProgression,
+    _apply_sqlite_pragmas,
+    get_engine,
+    get_prod_db_ops,
+    habit_logs_query,
+    transactions_page_query,
+)
+from src.database import utils
+from src.database.tenants import (
+    TENANT_POOL_MAX_OVERFLOW,
+    TENANT_POOL_SIZE,
+    TENANT_SQLITE_PRAGMAS,
+    current_tenant,
+    get_tenant_router,
+    tenant_db_name,
+)
+
+_async_engines: dict[str, AsyncEngine] = {}
+_async_engines_lock = threading.Lock()
+
+
+def get_async_engine(
+        db_url: str,
+        pool_size: int = POOL_SIZE,
+        max_overflow: int = POOL_MAX_OVERFLOW,
+        pragmas: dict | None = None,
+) -> AsyncEngine:
+    """
+    Return the shared aiosqlite engine for a sqlite:/// `db_url`.
+
+    The schema is created and migrated through the sync engine first, so
+    both engines always see the same schema version.
+    """
+    engine = _async_engines.get(db_url)
+    if engine is not None:
+        return engine
+
+    get_engine(db_url, pool_size, max_overflow, pragmas)
+    with _async_engines_lock:
+        engine = _async_engines.get(db_url)
+        if engine is None:
+            engine = create_async_engine(
+                db_url.replace("sqlite:///", "sqlite+aiosqlite:///", 1),
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+            )
+            event.listen(engine.sync_engine, "connect", functools.partial(_apply_sqlite_pragmas, pragmas=pragmas))
+            instrument_engine(engine.sync_engine)
+            _async_engines[db_url] = engine
+        return engine
+
+
+class AsyncDbOps:
+    """
+    Awaitable counterpart of DbOps for loading independent data concurrently.
+
+    Reads run natively on an aiosqlite engine. Every call uses its own
+    AsyncSession and pooled connection, so reads passed to asyncio.gather
+    really overlap. Any other DbOps method is available under the same name
+    and runs the sync implementation in a worker thread. Writes therefore
+    still go through one code path, which maintains rollups, balances, habit
+    versions and query cache invalidation.
+
+    Results are detached from their session. Relationships a caller needs
+    are loaded eagerly, because lazy loading is not available under asyncio.
+    """
+
+    def __init__(
+            self,
+            db_name="database.db",
+            sync: DbOps | None = None,
+            pool_size: int = POOL_SIZE,
+            max_overflow: int = POOL_MAX_OVERFLOW,
+            pragmas: dict | None = None,
+    ):
+        db_url = f'sqlite:///{utils.db_folder}/{db_name}'
+        # Pass the app's DbOps so habit version listeners (e.g. the render cache) see writes made through here
+        self.sync = sync or DbOps(db_name)
+        self.engine = get_async_engine(db_url, pool_size, max_overflow, pragmas)
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+        # Shared with the sync DbOps, whose writes bump its table versions
+        self.query_cache = self.sync.query_cache
+
+    def __getattr__(self, name: str):
+        if name == "sync":
+            raise AttributeError(name)
+        method = getattr(self.sync, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def run_in_thread(*args, **kwargs):
+            return await asyncio.to_thread(self._call_sync, method, *args, **kwargs)
+
+        return run_in_thread
+
+    def _call_sync(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        finally:
+            # Worker threads are pooled; don't let each one pin a session and connection
+            self.sync.remove_session()
+
+    def habit_data_version(self, habit_id: str) -> int:
+        return self.sync.habit_data_version(habit_id)
+
+    def cache_stats(self) -> dict[str, float]:
+        return self.sync.cache_stats()
+
+    async def _all(self, stmt) -> list:
+        async with self.session_factory() as session:
+            result = (await session.execute(stmt)).scalars().all()
+            session.expunge_all()
+            return result
+
+    async def _cached(self, key: str, tables: tuple[str, ...], stmt) -> tuple:
+        """Same entries as DbOps' cached listings; a miss is loaded asynchronously."""
+        stamp, result = self.query_cache.lookup(key, tables)
+        if result is None:
+            result = tuple(await self._all(stmt))
+            self.query_cache.store(key, stamp, result)
+        return result
+
+    async def get_all_goals(self) -> Sequence[Goal]:
+        return await self._cached("get_all_goals", ("goals",), select(Goal))
+
+    async def list_all_habits(self) -> Sequence[Habit]:
+        return await self._cached("list_all_habits", ("habits",), select(Habit))
+
+    async def list_xp_progressions(self) -> Sequence[XPProgression]:
+        return await self._cached("list_xp_progressions", ("xp_progressions",), select(XPProgression))
+
+    async def list_grinds(self) -> Sequence[Grind]:
+        return await self._cached("list_grinds", ("grinds",), select(Grind))
+
+    async def list_accounts(self) -> Sequence[Account]:
+        return await self._cached("list_accounts", ("accounts",), select(Account))
+
+    async def list_tags(self) -> Sequence[Tag]:
+        return await self._cached("list_tags", ("tags",), select(Tag))
+
+    async def get_habit_rollups(self, habit_id: str, period_type: str = "MONTH") -> Sequence[HabitRollup]:
+        return await self._all(
+            select(HabitRollup)
+            .where(HabitRollup.habit_id == habit_id, HabitRollup.period_type == period_type)
+            .order_by(HabitRollup.period_start)
+        )
+
+    async def get_habit_logs_for_day(self, target_date: date) -> Sequence[HabitLog]:
+        return await self._all(select(HabitLog).where(HabitLog.log_date == target_date))
+
+    async def get_habit_logs_by_habit(
+            self,
+            habit_id: str,
+            start: date | None = None,
+            end: date | None = None,
+            limit: int | None = None,
+    ) -> list[HabitLog]:
+        return await self._all(habit_logs_query(habit_id, start, end, limit))
+
+    async def list_tasks(self) -> Sequence[Task]:
+        return await self._all(select(Task))
+
+    async def list_transactions(self) -> Sequence[Transaction]:
+        return await self._all(select(Transaction).options(selectinload(Transaction.tags)))
+
+    async def list_transactions_page(
+            self,
+            limit: int = 50,
+            after: tuple[date, str] | None = None,
+            start_date: date | None = None,
+            end_date: date | None = None,
+            account_ids: Iterable[str] | None = None,
+    ) -> Sequence[Transaction]:
+        return await self._all(transactions_page_query(limit, after, start_date, end_date, account_ids))
+
+
+async def gather_page_data(**queries: Awaitable[Any]) -> dict[str, Any]:
+    """
+    Await independent queries concurrently.
+
+    Example:
+        data = await gather_page_data(habits=ops.list_all_habits(), tags=ops.list_tags())
+
+    Returns:
+        Each query's result under its keyword.
+    """
+    results = await asyncio.gather(*queries.values())
+    return dict(zip(queries.keys(), results))
+
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    # One long-lived loop for the process: pooled aiosqlite connections stay
+    # bound to it, and concurrent page runs from different sessions share it.
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-db-ops", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+async def _in_context(context: contextvars.Context, coro: Coroutine[Any, Any, Any]) -> Any:
+    # A task copies the context current when it is created
+    return await context.run(asyncio.ensure_future, coro)
+
+
+def run(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Run `coro` on the shared background loop and block until it finishes (for sync callers like Streamlit scripts).
+
+    The coroutine runs in a copy of the caller's context, so its queries are
+    attributed to the caller's page render (see instrumentation.begin_render).
+    """
+    return asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coro), _background_loop()).result()
+
+
+def load_page_data(**queries: Coroutine[Any, Any, Any]) -> dict[str, Any]:
+    """Blocking gather_page_data, for use at the top of a page script."""
+    return run(gather_page_data(**queries))
+
+
+_async_db_ops: AsyncDbOps | None = None
+_async_db_ops_lock = threading.Lock()
+_tenant_async_db_ops: dict[str, AsyncDbOps] = {}
+
+
+def get_async_db_ops() -> AsyncDbOps:
+    """
+    Return the AsyncDbOps of the calling thread's tenant, or the shared production one.
+
+    See tenants.set_current_tenant.
+    """
+    tenant_id = current_tenant()
+    if tenant_id is not None:
+        return _get_tenant_async_db_ops(tenant_id)
+
+    global _async_db_ops
+    if _async_db_ops is None:
+        with _async_db_ops_lock:
+            if _async_db_ops is None:
+                _async_db_ops = AsyncDbOps(PROD_DB_NAME, sync=get_prod_db_ops())
+    return _async_db_ops
+
+
+def _get_tenant_async_db_ops(tenant_id: str) -> AsyncDbOps:
+    router = get_tenant_router()
+    sync = router.get(tenant_id)
+    with _async_db_ops_lock:
+        async_db_ops = _tenant_async_db_ops.get(tenant_id)
+        if async_db_ops is None or async_db_ops.sync is not sync:
+            router.add_eviction_listener(_close_tenant_async_engine)
+            async_db_ops = _tenant_async_db_ops[tenant_id] = AsyncDbOps(
+                tenant_db_name(tenant_id),
+                sync=sync,
+                pool_size=TENANT_POOL_SIZE,
+                max_overflow=TENANT_POOL_MAX_OVERFLOW,
+                pragmas=TENANT_SQLITE_PRAGMAS,
+            )
+        return async_db_ops
+
+
+def _close_tenant_async_engine(tenant_id: str, db_url: str):
+    # Closing a tenant's sync engine must not leave its aiosqlite connections open
+    with _async_db_ops_lock:
+        _tenant_async_db_ops.pop(tenant_id, None)
+    with _async_engines_lock:
+        engine = _async_engines.pop(db_url, None)
+    if engine is not None:
+        run(engine.dispose())
@@ -0,0 +1,138 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from dataclasses import dataclass
+from typing import Sequence
+
+from sqlalchemy import Connection, literal, select, text
+from sqlalchemy.orm import Session
+
+from src.database.utils import Goal, GoalClosure
+
+
+@dataclass(frozen=True)
+class GoalProgress:
+    goal_id: str
+    depth: int  # distance from the requested root, or from the tree root when loading every goal
+    total_tasks: int
+    completed_tasks: int
+    total_xp: int
+    completed_xp: int
+    total_subgoals: int
+    completed_subgoals: int
+
+    @property
+    def progress(self) -> float:
+        """
+        Fraction of the goal that is done.
+
+        Weighted by task XP when the subtree's tasks carry XP, otherwise by task
+        count, otherwise by completed sub-goals.
+        """
+        if self.total_xp:
+            return self.completed_xp / self.total_xp
+        if self.total_tasks:
+            return self.completed_tasks / self.total_tasks
+        if self.total_subgoals:
+            return self.completed_subgoals / self.total_subgoals
+        return 0.0
+
+
+def add_goal_to_closure(session: Session, goal_id: str, parent_id: str | None):
+    """Link a new goal into the closure table: itself at depth 0 plus every ancestor of its parent."""
+    session.execute(GoalClosure.__table__.insert().values(ancestor_id=goal_id, descendant_id=goal_id, depth=0))
+    if parent_id is not None:
+        session.execute(
+            GoalClosure.__table__.insert().from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(GoalClosure.ancestor_id, literal(goal_id), GoalClosure.depth + 1)
+                .where(GoalClosure.descendant_id == parent_id),
+            )
+        )
+
+
+def get_subtree(session: Session, goal_id: str) -> Sequence[Goal]:
+    return session.execute(
+        select(Goal)
+        .join(GoalClosure, GoalClosure.descendant_id == Goal.id)
+        .where(GoalClosure.ancestor_id == goal_id)
+        .order_by(GoalClosure.depth)
+    ).scalars().all()
+
+
+def get_ancestors(session: Session, goal_id: str) -> Sequence[Goal]:
+    return session.execute(
+        select(Goal)
+        .join(GoalClosure, GoalClosure.ancestor_id == Goal.id)
+        .where(GoalClosure.descendant_id == goal_id, GoalClosure.depth > 0)
+        .order_by(GoalClosure.depth.desc())
+    ).scalars().all()
+
+
+# Every goal's task and sub-goal totals over its whole subtree in one pass over
+# the closure table. :root limits the result to one subtree when given.
+GOAL_PROGRESS_SQL = """
+    SELECT g.id,
+           scope.depth,
+           COALESCE(tk.total_tasks, 0), COALESCE(tk.completed_tasks, 0),
+           COALESCE(tk.total_xp, 0), COALESCE(tk.completed_xp, 0),
+           COALESCE(sg.total_subgoals, 0), COALESCE(sg.completed_subgoals, 0)
+    FROM goals g
+    JOIN (
+        SELECT descendant_id AS goal_id, MAX(depth) AS depth
+        FROM goal_closure
+        WHERE ancestor_id = :root OR :root IS NULL
+        GROUP BY descendant_id
+    ) scope ON scope.goal_id = g.id
+    LEFT JOIN (
+        SELECT c.ancestor_id AS goal_id,
+               COUNT(t.id) AS total_tasks,
+               SUM(CASE WHEN t.is_completed THEN 1 ELSE 0 END) AS completed_tasks,
+               SUM(COALESCE(t.xp, 0)) AS total_xp,
+               SUM(CASE WHEN t.is_completed THEN COALESCE(t.xp, 0) ELSE 0 END) AS completed_xp
+        FROM goal_closure c
+        JOIN tasks t ON t.goal_id = c.descendant_id
+        GROUP BY c.ancestor_id
+    ) tk ON tk.goal_id = g.id
+    LEFT JOIN (
+        SELECT c.ancestor_id AS goal_id,
+               COUNT(*) AS total_subgoals,
+               SUM(CASE WHEN sub.is_completed THEN 1 ELSE 0 END) AS completed_subgoals
+        FROM goal_closure c
+        JOIN goals sub ON sub.id = c.descendant_id
+        WHERE c.depth > 0
+        GROUP BY c.ancestor_id
+    ) sg ON sg.goal_id = g.id
+    ORDER BY scope.depth
+"""
+
+
+def goal_progress(session: Session, goal_id: str | None = None) -> dict[str, GoalProgress]:
+    """
+    Roll task and sub-goal completion up the goal tree in a single query.
+
+    Args:
+        session: Database session.
+        goal_id: Root of the subtree to load. Defaults to every goal.
+
+    Returns:
+        GoalProgress per goal id, shallowest goals first.
+    """
+    rows = session.execute(text(GOAL_PROGRESS_SQL), {"root": goal_id}).all()
+    return {row[0]: GoalProgress(*row) for row in rows}
+
+
+def rebuild_goal_closure(conn: Connection):
+    """Regenerate the closure table from goals.parent_id with a recursive CTE."""
+    conn.execute(text("DELETE FROM goal_closure"))
+    inserted = conn.execute(text("""
+        WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM goals
+            UNION ALL
+            SELECT tree.ancestor_id, g.id, tree.depth + 1
+            FROM tree JOIN goals g ON g.parent_id = tree.descendant_id
+        )
+        INSERT INTO goal_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM tree
+    """)).rowcount
+    logger.info("Rebuilt goal closure with %s rows", inserted)
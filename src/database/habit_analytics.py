@@ -0,0 +1,284 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import json
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Sequence
+
+import numpy as np
+from src.database.instrumentation import recorded
+from src.database.utils import HABIT_LOG_CHUNK_SIZE, DbOps, Habit
+
+
+@dataclass(frozen=True)
+class HabitMatrix:
+    """Dense date x habit view of the habit logs; days without a log hold 0."""
+    dates: np.ndarray  # datetime64[D], shape (days,)
+    habits: Sequence[Habit]  # column order
+    values: np.ndarray  # float64, shape (days, habits)
+    logged: np.ndarray  # bool, shape (days, habits)
+
+    @property
+    def habit_ids(self) -> list[str]:
+        return [habit.id for habit in self.habits]
+
+    def column(self, habit_id: str) -> int:
+        return self.habit_ids.index(habit_id)
+
+
+@dataclass(frozen=True)
+class HabitScores:
+    """Per-habit target scoring; every array has one entry per matrix column."""
+    habit_ids: list[str]
+    attained: np.ndarray  # bool, shape (days, habits): rolling period target met on that day
+    period_totals: np.ndarray  # float64, shape (days, habits): sum over the trailing period
+    current_streak: np.ndarray  # int, days the target has been met up to the last day
+    longest_streak: np.ndarray  # int
+    adherence: np.ndarray  # float64, fraction of days the target was met
+
+
+@dataclass(frozen=True)
+class HabitCorrelations:
+    """Pearson correlations between habits, with habit j shifted `lag` days after habit i."""
+    habit_ids: list[str]
+    lags: np.ndarray  # int, shape (lags,), starting at 0
+    correlations: np.ndarray  # float64, shape (lags, habits, habits); NaN where a series is constant
+
+    def at_lag(self, lag: int) -> np.ndarray:
+        """Correlation of habit i on day t with habit j on day t + lag; lag 0 is the symmetric pairwise matrix."""
+        return self.correlations[int(np.searchsorted(self.lags, lag))]
+
+
+def load_habit_matrix(
+        db_ops: DbOps,
+        habit_ids: Iterable[str] | None = None,
+        start: date | None = None,
+        end: date | None = None,
+) -> HabitMatrix:
+    """
+    Load habit logs into a dense date x habit matrix with a single query.
+
+    Args:
+        db_ops: Database handle.
+        habit_ids: Restrict the columns to these habits. Defaults to all habits.
+        start: First day of the matrix. Defaults to the earliest log.
+        end: Last day of the matrix. Defaults to today.
+
+    Returns:
+        A HabitMatrix covering every day from start to end.
+    """
+    habits = db_ops.list_all_habits()
+    if habit_ids is not None:
+        wanted = set(habit_ids)
+        habits = [habit for habit in habits if habit.id in wanted]
+
+    # One query pivots every habit: json_each drives the join with the
+    # requested ids, so each habit's logs come from a range scan of the
+    # (habit_id, log_date) key and arrive already tagged with their column.
+    # Rows are plain numbers (column, days since epoch, value) read straight
+    # off the DBAPI cursor, skipping Row/date construction (and the engine
+    # events, so the query is recorded explicitly for the diagnostics page).
+    sql = (
+        "SELECT CAST(j.key AS INTEGER), CAST(julianday(l.log_date) - 2440587.5 AS INTEGER), l.value "
+        "FROM json_each(?) AS j CROSS JOIN habit_logs AS l ON l.habit_id = j.value WHERE 1 = 1"
+    )
+    params = [json.dumps([habit.id for habit in habits])]
+    if start is not None:
+        sql += " AND l.log_date >= ?"
+        params.append(start.isoformat())
+    if end is not None:
+        sql += " AND l.log_date <= ?"
+        params.append(end.isoformat())
+
+    dbapi_connection = db_ops.db.connection().connection
+    cursor = dbapi_connection.cursor()
+    try:
+        with recorded(sql):
+            logs = np.array(cursor.execute(sql, params).fetchall(), dtype=np.float64).reshape(-1, 3)
+    finally:
+        cursor.close()
+
+    matrix = _build_matrix(
+        habits, logs[:, 0].astype(np.int64), logs[:, 1].astype(np.int64), logs[:, 2], start, end
+    )
+    logger.info("Loaded habit matrix of %s days x %s habits from %s logs", len(matrix.dates), len(habits), len(logs))
+    return matrix
+
+
+def habit_matrix_from_series(
+        habit: Habit,
+        dates: np.ndarray,
+        values: np.ndarray,
+        start: date | None = None,
+        end: date | None = None,
+) -> HabitMatrix:
+    """
+    One-column HabitMatrix from a habit's already loaded logs, without querying again.
+
+    Args:
+        habit: The habit the logs belong to.
+        dates, values: Arrays as returned by load_habit_series / DbOps.habit_log_arrays.
+        start, end: As for load_habit_matrix.
+    """
+    log_days = dates.astype("datetime64[D]").astype(np.int64)
+    return _build_matrix([habit], np.zeros(len(log_days), dtype=np.int64), log_days, values, start, end)
+
+
+def _build_matrix(
+        habits: Sequence[Habit],
+        columns: np.ndarray,
+        log_days: np.ndarray,
+        log_values: np.ndarray,
+        start: date | None,
+        end: date | None,
+) -> HabitMatrix:
+    """Scatter (column, days since epoch, value) logs into a dense matrix covering start to end."""
+    log_values = np.nan_to_num(log_values)  # NULL values count as 0
+
+    today = np.datetime64(date.today(), "D").astype(np.int64)
+    if start is not None:
+        first = np.datetime64(start, "D").astype(np.int64)
+    else:
+        first = log_days.min() if len(log_days) else today
+    if end is not None:
+        last = np.datetime64(end, "D").astype(np.int64)
+    else:
+        last = max(today, log_days.max()) if len(log_days) else today
+    dates = np.arange(first, last + 1).astype("datetime64[D]")
+
+    rows_idx = log_days - first
+    keep = (rows_idx >= 0) & (rows_idx < len(dates))
+
+    values = np.zeros((len(dates), len(habits)), dtype=np.float64)
+    logged = np.zeros((len(dates), len(habits)), dtype=bool)
+    values[rows_idx[keep], columns[keep]] = log_values[keep]
+    logged[rows_idx[keep], columns[keep]] = True
+    return HabitMatrix(dates=dates, habits=habits, values=values, logged=logged)
+
+
+def load_habit_series(
+        db_ops: DbOps,
+        habit_id: str,
+        start: date | None = None,
+        end: date | None = None,
+        chunk_size: int = HABIT_LOG_CHUNK_SIZE,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Load one habit's logs straight into column arrays, oldest first.
+
+    Rows are read off the DBAPI cursor in chunks and packed into float
+    arrays as they arrive, so no HabitLog or date objects are built and the
+    Python-level working set stays at one chunk.
+
+    Returns:
+        (dates, values): datetime64[D] and float64 arrays; NULL values are NaN.
+    """
+    sql = "SELECT CAST(julianday(log_date) - 2440587.5 AS INTEGER), value FROM habit_logs WHERE habit_id = ?"
+    params = [habit_id]
+    if start is not None:
+        sql += " AND log_date >= ?"
+        params.append(start.isoformat())
+    if end is not None:
+        sql += " AND log_date <= ?"
+        params.append(end.isoformat())
+    sql += " ORDER BY log_date"
+
+    chunks = []
+    cursor = db_ops.db.connection().connection.cursor()
+    try:
+        with recorded(sql):
+            cursor.execute(sql, params)
+            while rows := cursor.fetchmany(chunk_size):
+                chunks.append(np.array(rows, dtype=np.float64))
+    finally:
+        cursor.close()
+
+    logs = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.float64)
+    return logs[:, 0].astype(np.int64).astype("datetime64[D]"), logs[:, 1]
+
+
+def _trailing_streak(flags: np.ndarray) -> np.ndarray:
+    """Length of the run of True values ending at each row, per column."""
+    counts = np.cumsum(flags, axis=0)
+    # Count at the most recent False row, carried forward down each column
+    resets = np.maximum.accumulate(np.where(flags, 0, counts), axis=0)
+    return counts - resets
+
+
+def score_habits(matrix: HabitMatrix) -> HabitScores:
+    """
+    Score every habit in `matrix` against its target, without per-day loops.
+
+    A day counts as attained when the total over the trailing
+    `target_period_in_days` window reaches `target_frequency_value`. For
+    negative habits the comparison is inverted: the window total must stay at
+    or below the target.
+    """
+    days, n_habits = matrix.values.shape
+    periods = np.array([max(habit.target_period_in_days or 1, 1) for habit in matrix.habits], dtype=np.int64)
+    targets = np.array([
+        habit.target_frequency_value if habit.target_frequency_value is not None
+        else (0.0 if habit.is_negative_habit else 1.0)
+        for habit in matrix.habits
+    ], dtype=np.float64)
+    negative = np.array([bool(habit.is_negative_habit) for habit in matrix.habits], dtype=bool)
+
+    # Rolling window sums from a prefix sum, with a per-habit window length
+    prefix = np.vstack([np.zeros((1, n_habits)), np.cumsum(matrix.values, axis=0)])
+    window_end = np.arange(1, days + 1)[:, None]
+    window_start = np.clip(window_end - periods[None, :], 0, None)
+    cols = np.arange(n_habits)[None, :]
+    period_totals = prefix[window_end, cols] - prefix[window_start, cols]
+
+    attained = np.where(negative[None, :], period_totals <= targets[None, :], period_totals >= targets[None, :])
+
+    streaks = _trailing_streak(attained)
+    current_streak = streaks[-1] if days else np.zeros(n_habits, dtype=np.int64)
+    longest_streak = streaks.max(axis=0) if days else np.zeros(n_habits, dtype=np.int64)
+    adherence = attained.mean(axis=0) if days else np.zeros(n_habits, dtype=np.float64)
+
+    return HabitScores(
+        habit_ids=matrix.habit_ids,
+        attained=attained,
+        period_totals=period_totals,
+        current_streak=current_streak,
+        longest_streak=longest_streak,
+        adherence=adherence,
+    )
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    """Zero-mean, unit-variance columns; constant columns become NaN."""
+    std = values.std(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (values - values.mean(axis=0)) / np.where(std > 0, std, np.nan)
+
+
+def correlate_habits(matrix: HabitMatrix, max_lag: int = 0) -> HabitCorrelations:
+    """
+    Correlate every pair of habits at every lag from 0 to `max_lag` days.
+
+    Each lag is one matrix product over the overlapping days, so the cost
+    does not depend on the number of pairs in Python. Days without a log
+    count as 0, as in the matrix.
+
+    Args:
+        matrix: Output of load_habit_matrix.
+        max_lag: Largest shift, in days, of the second habit after the first.
+
+    Returns:
+        HabitCorrelations for lags 0..max_lag (fewer if the matrix is shorter).
+    """
+    days, n_habits = matrix.values.shape
+    lags = np.arange(0, max(min(max_lag, days - 2), 0) + 1)
+    correlations = np.full((len(lags), n_habits, n_habits), np.nan)
+    for index, lag in enumerate(lags):
+        overlap = days - lag
+        if overlap < 2:
+            continue
+        leading = _standardize(matrix.values[:overlap])
+        following = _standardize(matrix.values[lag:])
+        correlations[index] = leading.T @ following / overlap
+
+    return HabitCorrelations(habit_ids=matrix.habit_ids, lags=lags, correlations=correlations)
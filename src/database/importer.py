@@ -0,0 +1,225 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import csv
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+from uuid import uuid4
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.database.ledger import apply_balance_deltas
+from src.database.utils import DbOps, Tag, Transaction, transaction_tag_table
+
+IMPORT_CHUNK_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class StatementLine:
+    """One transaction read from a bank statement, in this app's sign convention."""
+    txn_date: date
+    amount: float  # positive for money leaving the account, as in create_transaction
+    description: str
+    tag_names: tuple[str, ...] = ()
+    external_id: str | None = None  # bank-assigned id (OFX FITID) when available
+
+
+@dataclass
+class ImportResult:
+    imported: int = 0
+    skipped: int = 0
+    new_tags: set[str] = field(default_factory=set)
+
+
+def read_csv_statement(
+        lines: Iterable[str],
+        date_format: str = "%Y-%m-%d",
+        tag_separator: str = ";"
+) -> Iterator[StatementLine]:
+    """
+    Stream StatementLines from CSV text with date, amount, description and optional tags columns.
+
+    Header names are matched case-insensitively. Amounts are taken as they are,
+    so positive values reduce the account balance.
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        row = {(key or "").strip().lower(): (value or "").strip() for key, value in row.items()}
+        tags = tuple(tag.strip() for tag in row.get("tags", "").split(tag_separator) if tag.strip())
+        yield StatementLine(
+            txn_date=datetime.strptime(row["date"], date_format).date(),
+            amount=float(row["amount"]),
+            description=row.get("description", ""),
+            tag_names=tags,
+        )
+
+
+# An opening or closing tag and the text up to the next tag. SGML OFX leaves
+# leaf elements unclosed, so a field's value is whatever follows its tag.
+_OFX_TOKEN = re.compile(r"<(/?)([\w.]+)>([^<]*)")
+
+
+def _ofx_tokens(chunks: Iterable[str]) -> Iterator[tuple[str, str, str]]:
+    """
+    Yield (closing slash, tag, text) for every tag in the stream, regardless of line breaks.
+
+    Exports may put a whole <BANKTRANLIST> on one line or none at all, so tags
+    are found across chunk boundaries. The text after the last tag of a chunk
+    may continue in the next one and is carried over until a tag follows it.
+    """
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        last_tag = buffer.rfind("<")
+        if last_tag > 0:
+            yield from _OFX_TOKEN.findall(buffer, 0, last_tag)
+            buffer = buffer[last_tag:]
+    yield from _OFX_TOKEN.findall(buffer)
+
+
+def read_ofx_statement(lines: Iterable[str]) -> Iterator[StatementLine]:
+    """
+    Stream StatementLines from the <STMTTRN> blocks of an OFX (SGML or XML) file.
+
+    A transaction is emitted at each </STMTTRN>, however the file is split
+    into lines. OFX amounts are signed from the account's point of view
+    (debits negative), so they are negated to match create_transaction's
+    convention.
+    """
+    fields: dict[str, str] | None = None
+    for closing, tag, value in _ofx_tokens(lines):
+        tag = tag.upper()
+        if tag == "STMTTRN":
+            if not closing:
+                fields = {}
+            elif fields is not None:
+                yield StatementLine(
+                    txn_date=datetime.strptime(fields["DTPOSTED"][:8], "%Y%m%d").date(),
+                    amount=-float(fields["TRNAMT"]),
+                    description=fields.get("NAME") or fields.get("MEMO", ""),
+                    external_id=fields.get("FITID"),
+                )
+                fields = None
+        elif fields is not None and not closing:
+            fields[tag] = value.strip()
+
+
+def _content_hashes(account_id: str, lines: list[StatementLine], seen: Counter) -> list[str]:
+    """
+    Hash each line by its content, or by the bank's id when there is one.
+
+    Identical lines within one statement (two equal coffees on one day) are
+    told apart by their occurrence number, so re-importing the same file
+    yields the same hashes.
+    """
+    hashes = []
+    for line in lines:
+        if line.external_id:
+            key = f"{account_id}|fitid|{line.external_id}"
+        else:
+            content = f"{account_id}|{line.txn_date.isoformat()}|{line.amount:.2f}|{line.description}"
+            seen[content] += 1
+            key = f"{content}|{seen[content]}"
+        hashes.append(hashlib.sha256(key.encode()).hexdigest())
+    return hashes
+
+
+def import_statement(
+        db_ops: DbOps,
+        account_id: str,
+        lines: Iterable[StatementLine],
+        chunk_size: int = IMPORT_CHUNK_SIZE
+) -> ImportResult:
+    """
+    Bulk import statement lines into an account, one commit per chunk.
+
+    Each chunk costs a fixed number of statements: one hash lookup, one tag
+    insert, executemany inserts for transactions and their tags, and the
+    batched balance/checkpoint update. Lines whose hash is already stored are
+    skipped, so importing an overlapping statement twice is safe.
+
+    Args:
+        db_ops: Database handle.
+        account_id: Account the statement belongs to.
+        lines: StatementLines, typically from read_csv_statement or read_ofx_statement.
+        chunk_size: Lines written per transaction.
+
+    Returns:
+        Counts of imported and skipped lines and the tags that were created.
+    """
+    session = db_ops.db
+    known_tags = set(session.execute(select(Tag.name)).scalars())
+    seen = Counter()
+    result = ImportResult()
+
+    lines = iter(lines)
+    while chunk := list(islice(lines, chunk_size)):
+        hashes = _content_hashes(account_id, chunk, seen)
+        existing = set(session.execute(
+            select(Transaction.import_hash).where(Transaction.import_hash.in_(hashes))
+        ).scalars())
+
+        txn_rows, tag_rows, deltas = [], [], []
+        new_tags = set()
+        for line, content_hash in zip(chunk, hashes):
+            if content_hash in existing:
+                result.skipped += 1
+                continue
+            existing.add(content_hash)
+            txn_id = str(uuid4())
+            txn_rows.append({
+                "id": txn_id,
+                "account_id": account_id,
+                "amount": line.amount,
+                "date": line.txn_date,
+                "description": line.description,
+                "import_hash": content_hash,
+            })
+            for tag_name in set(line.tag_names):
+                tag_rows.append({"transaction_id": txn_id, "tag_name": tag_name})
+                if tag_name not in known_tags:
+                    new_tags.add(tag_name)
+            deltas.append((line.txn_date, -line.amount))
+
+        if new_tags:
+            session.execute(sqlite_insert(Tag).on_conflict_do_nothing(), [{"name": name} for name in new_tags])
+            known_tags |= new_tags
+            result.new_tags |= new_tags
+        if txn_rows:
+            session.execute(insert(Transaction.__table__), txn_rows)
+        if tag_rows:
+            session.execute(insert(transaction_tag_table), tag_rows)
+        apply_balance_deltas(session, account_id, deltas)
+        session.commit()
+
+        result.imported += len(txn_rows)
+        logger.info("Imported chunk of %s transactions into account %s", len(txn_rows), account_id)
+
+    logger.info("Import into %s finished: %s imported, %s skipped", account_id, result.imported, result.skipped)
+    return result
+
+
+def import_statement_file(db_ops: DbOps, account_id: str, path: str | Path, **reader_options) -> ImportResult:
+    """Import a .csv or .ofx/.qfx statement file, streaming it from disk."""
+    path = Path(path)
+    reader = read_ofx_statement if path.suffix.lower() in (".ofx", ".qfx") else read_csv_statement
+    with open(path, newline="", encoding="utf-8") as f:
+        return import_statement(db_ops, account_id, reader(f, **reader_options))
+
+
+if __name__ == "__main__":
+    import sys
+
+    from src.logging_config import setup_logging
+    setup_logging()
+
+    statement_path, statement_account_id = sys.argv[1], sys.argv[2]
+    db_name = sys.argv[3] if len(sys.argv) > 3 else "prod.db"
+    print(import_statement_file(DbOps(db_name), statement_account_id, statement_path))
@@ -0,0 +1,272 @@
+import logging
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("src.database.slow_queries")
+
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from sqlalchemy import Engine, event
+
+# Set SQL_INSTRUMENTATION=0 to skip installing the engine hooks entirely.
+INSTRUMENTATION_ENABLED = os.environ.get("SQL_INSTRUMENTATION", "1") != "0"
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+# A statement shape repeated this often within one page render is reported as N+1.
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("N_PLUS_ONE_THRESHOLD", "10"))
+
+MAX_FINGERPRINTS = 1000
+MAX_RENDERS = 100
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(VALUES\s*\(\?\.\.\.\))(?:\s*,\s*\(\?\.\.\.\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Normalize a statement so executions that differ only in values group together.
+
+    Literals become ?, placeholder lists of any length become (?...) and
+    multi-row VALUES collapse to one row.
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _PLACEHOLDER_LIST.sub("(?...)", normalized)
+    normalized = _WHITESPACE.sub(" ", normalized).strip()
+    return _VALUES_LIST.sub(r"\1", normalized)
+
+
+@dataclass
+class StatementStats:
+    fingerprint: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    # Rows written by INSERT/UPDATE/DELETE; None for statements that return
+    # rows, since the driver's rowcount is -1 or 0 for those until they are fetched
+    rows_written: int | None = None
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+
+@dataclass
+class RenderStats:
+    """Queries issued by one run of a page script."""
+    page: str
+    started_at: float
+    query_count: int = 0
+    total_ms: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+
+    def n_plus_one(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int]]:
+        """Statement shapes repeated at least `threshold` times in this render."""
+        return [(fp, count) for fp, count in self.fingerprints.most_common() if count >= threshold]
+
+
+# Render the current queries belong to. A context variable rather than a
+# thread-local, so it follows the page's work into asyncio tasks and
+# asyncio.to_thread workers (see async_ops.run).
+_current_render: ContextVar["RenderStats | None"] = ContextVar("current_render", default=None)
+
+
+class QueryRecorder:
+    """Collects per-statement timings from engine events, grouped by fingerprint and by page render."""
+
+    def __init__(self):
+        self._statements: dict[str, StatementStats] = {}
+        self._renders: deque[RenderStats] = deque(maxlen=MAX_RENDERS)
+        self._lock = threading.Lock()
+
+    def instrument(self, engine: Engine):
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started_at = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context._query_started_at) * 1000
+        # cursor.description is only set for statements that return rows
+        rows_written = max(cursor.rowcount, 0) if cursor.description is None else None
+        self.record(statement, elapsed_ms, rows_written)
+
+    def record(self, statement: str, elapsed_ms: float, rows_written: int | None = None):
+        """Add one execution of `statement` to the statistics and to the current render."""
+        fp = fingerprint(statement)
+        with self._lock:
+            stats = self._statements.get(fp)
+            if stats is None:
+                if len(self._statements) >= MAX_FINGERPRINTS:
+                    # Drop the cheapest shape to stay bounded
+                    del self._statements[min(self._statements.values(), key=lambda s: s.total_ms).fingerprint]
+                stats = self._statements[fp] = StatementStats(fp)
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            if rows_written is not None:
+                stats.rows_written = (stats.rows_written or 0) + rows_written
+
+        render = _current_render.get()
+        if render is not None:
+            render.query_count += 1
+            render.total_ms += elapsed_ms
+            render.fingerprints[fp] += 1
+
+        if elapsed_ms >= SLOW_QUERY_MS:
+            if rows_written is None:
+                slow_query_logger.warning("Slow query (%.1f ms): %s", elapsed_ms, fp)
+            else:
+                slow_query_logger.warning("Slow query (%.1f ms, %d rows written): %s", elapsed_ms, rows_written, fp)
+
+    def begin_render(self, page: str) -> RenderStats:
+        """Attribute the calling thread's following queries to a new render of `page`."""
+        render = RenderStats(page=page, started_at=time.time())
+        _current_render.set(render)
+        with self._lock:
+            self._renders.append(render)
+        return render
+
+    def end_render(self):
+        """Stop attributing the calling thread's queries to its current render."""
+        _current_render.set(None)
+
+    def top_statements(self, limit: int = 20) -> list[StatementStats]:
+        with self._lock:
+            return sorted(self._statements.values(), key=lambda s: s.total_ms, reverse=True)[:limit]
+
+    def recent_renders(self) -> list[RenderStats]:
+        with self._lock:
+            return list(reversed(self._renders))
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._renders.clear()
+
+
+recorder = QueryRecorder()
+
+
+def instrument_engine(engine: Engine):
+    if INSTRUMENTATION_ENABLED:
+        recorder.instrument(engine)
+
+
+@contextmanager
+def recorded(statement: str) -> Iterator[None]:
+    """
+    Record a statement run on a raw DBAPI cursor, which bypasses the engine events.
+
+    Wrap the execute and the fetches, so the time includes reading the rows.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if INSTRUMENTATION_ENABLED:
+            recorder.record(statement, (time.perf_counter() - started) * 1000)
+
+
+# Streamlit releases the end-of-run hook below was checked against. It relies
+# on ScriptRunner internals, so other releases get a warning at startup.
+STREAMLIT_TESTED_VERSIONS = ("1.65.",)
+
+# .state is the thread's _install_run_end_hook() result, once begin_render() has tried
+_run_end_hook = threading.local()
+_run_end_hook_warnings: set[str] = set()
+
+
+def _on_script_event(runner, event=None, **kwargs):
+    from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+
+    if event in (
+            ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS,
+            ScriptRunnerEvent.SCRIPT_STOPPED_WITH_COMPILE_ERROR,
+            ScriptRunnerEvent.SCRIPT_STOPPED_FOR_RERUN,
+            ScriptRunnerEvent.FRAGMENT_STOPPED_WITH_SUCCESS,
+    ):
+        end_render()
+
+
+def _warn_once(message: str, *args):
+    # Every script thread tries the hook; say it once per process
+    if message not in _run_end_hook_warnings:
+        _run_end_hook_warnings.add(message)
+        logger.warning(message, *args)
+
+
+def _install_run_end_hook() -> bool | None:
+    """
+    Call end_render() in the script thread whenever a Streamlit run of it stops.
+
+    Returns:
+        True once hooked, False in a Streamlit script thread where the hook
+        could not be installed because Streamlit's internals changed, and
+        None outside Streamlit script threads.
+    """
+    try:
+        import streamlit
+        from streamlit.runtime.scriptrunner import ScriptRunner, get_script_run_ctx
+    except ImportError:
+        return None
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+
+    if not streamlit.__version__.startswith(STREAMLIT_TESTED_VERSIONS):
+        _warn_once("Streamlit %s is untested with the end-of-run session release (tested: %s)",
+                   streamlit.__version__, ", ".join(STREAMLIT_TESTED_VERSIONS))
+    # Streamlit has no public end-of-run hook; the script thread's target is
+    # the bound ScriptRunner._run_script_thread, whose on_event signal
+    # reports the end of every run (st.stop, st.rerun and errors included).
+    runner = getattr(getattr(threading.current_thread(), "_target", None), "__self__", None)
+    on_event = getattr(runner, "on_event", None) if isinstance(runner, ScriptRunner) else None
+    if on_event is None:
+        _warn_once(
+            "Could not hook the end of Streamlit script runs (Streamlit %s); database sessions are "
+            "now released by the next run on the same thread or when the thread's locals are "
+            "garbage collected", streamlit.__version__,
+        )
+        return False
+    on_event.connect(_on_script_event)
+    return True
+
+
+def begin_render(page: str) -> RenderStats:
+    """
+    Start attributing the calling thread's queries to a render of `page`.
+
+    Pages call it at the top of the script. In a Streamlit script thread the
+    render also ends with the run, see end_render(). If that hook cannot be
+    installed (a warning is logged), sessions left over from a previous run
+    on the same thread are released here instead.
+    """
+    if not hasattr(_run_end_hook, "state"):
+        _run_end_hook.state = _install_run_end_hook()
+    if _run_end_hook.state is False:
+        end_render()
+    return recorder.begin_render(page)
+
+
+def end_render():
+    """
+    End the calling thread's render and close its database sessions.
+
+    Otherwise a script thread's scoped sessions keep a pooled connection
+    (and an open read transaction) checked out after the run: across the
+    reruns the thread serves, and after it exits until garbage collection
+    reclaims its locals.
+    """
+    from src.database.utils import remove_thread_sessions
+
+    recorder.end_render()
+    remove_thread_sessions()
@@ -0,0 +1,196 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from bisect import bisect_right
+from datetime import date, timedelta
+from itertools import accumulate
+
+from sqlalchemy import Connection, bindparam, func, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from src.database.utils import Account, BalanceCheckpoint, Transaction
+
+# Account balances move opposite to transaction amounts:
+#   balance(end of day d) = checkpoint balance - sum(amounts after the checkpoint up to d)
+
+
+def _month_end(day: date) -> date:
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def apply_balance_delta(session: Session, account_id: str, txn_date: date, delta: float):
+    """
+    Add `delta` to an account's balance and to every checkpoint on or after `txn_date`.
+
+    The balance updates are single SQL statements evaluated by SQLite, so
+    concurrent writers cannot overwrite each other's changes. A checkpoint is
+    created for the end of `txn_date`'s month if missing, which keeps the
+    checkpoints monthly as the ledger grows. Call this before the transaction
+    row itself is flushed.
+    """
+    month_end = _month_end(txn_date)
+    has_checkpoint = session.execute(
+        select(BalanceCheckpoint.balance)
+        .where(BalanceCheckpoint.account_id == account_id, BalanceCheckpoint.checkpoint_date == month_end)
+    ).first() is not None
+    if not has_checkpoint:
+        session.execute(insert(BalanceCheckpoint).values(
+            account_id=account_id,
+            checkpoint_date=month_end,
+            balance=balance_as_of(session, account_id, month_end),
+        ))
+
+    session.execute(
+        update(Account)
+        .where(Account.id == account_id)
+        .values(balance=Account.balance + delta)
+        .execution_options(synchronize_session=False)
+    )
+    session.execute(
+        update(BalanceCheckpoint)
+        .where(BalanceCheckpoint.account_id == account_id, BalanceCheckpoint.checkpoint_date >= txn_date)
+        .values(balance=BalanceCheckpoint.balance + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def apply_balance_deltas(session: Session, account_id: str, deltas: list[tuple[date, float]]):
+    """
+    Batched form of apply_balance_delta for many (txn_date, delta) pairs of one account.
+
+    Unlike apply_balance_delta, call this after the transaction rows are
+    flushed: missing month-end checkpoints are derived from the updated ledger.
+    Issues one balance UPDATE, one executemany over the existing checkpoints
+    and one insert per newly touched month.
+    """
+    if not deltas:
+        return
+    deltas = sorted(deltas)
+    dates = [txn_date for txn_date, _ in deltas]
+    running = list(accumulate(delta for _, delta in deltas))
+
+    session.execute(
+        update(Account)
+        .where(Account.id == account_id)
+        .values(balance=Account.balance + running[-1])
+        .execution_options(synchronize_session=False)
+    )
+
+    checkpoint_dates = session.execute(
+        select(BalanceCheckpoint.checkpoint_date)
+        .where(BalanceCheckpoint.account_id == account_id, BalanceCheckpoint.checkpoint_date >= dates[0])
+    ).scalars().all()
+    shifts = []
+    for checkpoint_date in checkpoint_dates:
+        # Every delta dated on or before the checkpoint moves it
+        applied = bisect_right(dates, checkpoint_date)
+        shifts.append({"b_account_id": account_id, "b_checkpoint_date": checkpoint_date, "b_shift": running[applied - 1]})
+    if shifts:
+        session.execute(
+            update(BalanceCheckpoint.__table__)
+            .where(
+                BalanceCheckpoint.account_id == bindparam("b_account_id"),
+                BalanceCheckpoint.checkpoint_date == bindparam("b_checkpoint_date"),
+            )
+            .values(balance=BalanceCheckpoint.balance + bindparam("b_shift")),
+            shifts,
+        )
+
+    existing = set(checkpoint_dates)
+    for month_end in sorted({_month_end(txn_date) for txn_date in dates} - existing):
+        session.execute(insert(BalanceCheckpoint).values(
+            account_id=account_id,
+            checkpoint_date=month_end,
+            balance=balance_as_of(session, account_id, month_end),
+        ))
+
+
+def _sum_amounts(session: Session, account_id: str, after: date | None, up_to: date | None) -> float:
+    """Sum of transaction amounts with after < date <= up_to (either bound optional)."""
+    stmt = select(func.coalesce(func.sum(Transaction.amount), 0.0)).where(Transaction.account_id == account_id)
+    if after is not None:
+        stmt = stmt.where(Transaction.date > after)
+    if up_to is not None:
+        stmt = stmt.where(Transaction.date <= up_to)
+    return session.execute(stmt).scalar_one()
+
+
+def balance_as_of(session: Session, account_id: str, as_of: date) -> float:
+    """
+    Balance of an account at the end of `as_of`.
+
+    Starts from the nearest checkpoint (an index seek) and sums only the
+    transactions between it and `as_of`, instead of replaying the whole ledger.
+    """
+    before = session.execute(
+        select(BalanceCheckpoint.checkpoint_date, BalanceCheckpoint.balance)
+        .where(BalanceCheckpoint.account_id == account_id, BalanceCheckpoint.checkpoint_date <= as_of)
+        .order_by(BalanceCheckpoint.checkpoint_date.desc())
+        .limit(1)
+    ).first()
+    if before is not None:
+        return before.balance - _sum_amounts(session, account_id, before.checkpoint_date, as_of)
+
+    after = session.execute(
+        select(BalanceCheckpoint.checkpoint_date, BalanceCheckpoint.balance)
+        .where(BalanceCheckpoint.account_id == account_id, BalanceCheckpoint.checkpoint_date > as_of)
+        .order_by(BalanceCheckpoint.checkpoint_date)
+        .limit(1)
+    ).first()
+    if after is not None:
+        return after.balance + _sum_amounts(session, account_id, as_of, after.checkpoint_date)
+
+    # No checkpoints yet: walk back from the current balance
+    current = session.execute(select(Account.balance).where(Account.id == account_id)).scalar_one()
+    return current + _sum_amounts(session, account_id, as_of, None)
+
+
+def balance_series(session: Session, account_id: str, start: date, end: date) -> list[tuple[date, float]]:
+    """End-of-day balances for every day from `start` to `end`, inclusive."""
+    balance = balance_as_of(session, account_id, start - timedelta(days=1))
+    daily_amounts = dict(session.execute(
+        select(Transaction.date, func.sum(Transaction.amount))
+        .where(Transaction.account_id == account_id, Transaction.date >= start, Transaction.date <= end)
+        .group_by(Transaction.date)
+    ).all())
+
+    series = []
+    day = start
+    while day <= end:
+        balance -= daily_amounts.get(day, 0.0)
+        series.append((day, balance))
+        day += timedelta(days=1)
+    return series
+
+
+def rebuild_balance_checkpoints(conn: Connection):
+    """
+    Regenerate one checkpoint per account for the end of every month with transactions.
+
+    Each checkpoint is derived from the current balance plus the amounts dated
+    after it, using a window sum over monthly totals.
+    """
+    conn.execute(text("DELETE FROM balance_checkpoints"))
+    inserted = conn.execute(text("""
+        INSERT INTO balance_checkpoints (account_id, checkpoint_date, balance)
+        SELECT m.account_id, m.month_end,
+               a.balance + SUM(m.total) OVER (PARTITION BY m.account_id)
+                         - SUM(m.total) OVER (PARTITION BY m.account_id ORDER BY m.month_end ROWS UNBOUNDED PRECEDING)
+        FROM (
+            SELECT account_id, date(date, 'start of month', '+1 month', '-1 day') AS month_end, SUM(amount) AS total
+            FROM transactions
+            GROUP BY account_id, month_end
+        ) m
+        JOIN accounts a ON a.id = m.account_id
+    """)).rowcount
+    logger.info("Rebuilt %s balance checkpoints", inserted)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from src.logging_config import setup_logging
+    from src.database.utils import DbOps
+    setup_logging()
+
+    DbOps(sys.argv[1] if len(sys.argv) > 1 else "prod.db").rebuild_balance_checkpoints()
@@ -0,0 +1,220 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import Connection, Engine, text
+
+from src.database.utils import Base
+from src.database.goals import rebuild_goal_closure
+from src.database.ledger import rebuild_balance_checkpoints
+from src.database.rollups import rebuild_habit_rollups
+from src.database.search import create_search_index, rebuild_search_index
+
+# Rows touched per statement when a migration rewrites existing data, so large
+# tables are upgraded without holding one huge write transaction in memory.
+MIGRATION_BATCH_SIZE = 10_000
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def get_schema_version(conn: Connection) -> int:
+    """Return the schema version recorded in the SQLite file header."""
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def set_schema_version(conn: Connection, version: int):
+    conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def create_indexes(conn: Connection, *index_names: str):
+    """Create the named indexes declared on the ORM models, skipping existing ones."""
+    indexes = {
+        index.name: index
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+    }
+    for name in index_names:
+        indexes[name].create(conn, checkfirst=True)
+        logger.info("Ensured index %s", name)
+
+
+def create_tables(conn: Connection, *table_names: str):
+    """Create the named ORM tables (and their indexes) if they are missing."""
+    for name in table_names:
+        Base.metadata.tables[name].create(conn, checkfirst=True)
+        logger.info("Ensured table %s", name)
+
+
+def add_columns(conn: Connection, table_name: str, *column_names: str):
+    """Add the named ORM columns to an existing table if they are missing."""
+    table = Base.metadata.tables[table_name]
+    existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table_name})")}
+    for name in column_names:
+        if name in existing:
+            continue
+        column_type = table.c[name].type.compile(dialect=conn.dialect)
+        conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}")
+        logger.info("Added column %s.%s", table_name, name)
+
+
+def batched_update(
+        conn: Connection,
+        table: str,
+        set_clause: str,
+        where_clause: str,
+        batch_size: int = MIGRATION_BATCH_SIZE,
+        **params
+) -> int:
+    """
+    Run an UPDATE over `table` in rowid batches until no row matches.
+
+    `where_clause` must stop matching a row once `set_clause` has been applied
+    to it, otherwise the loop never terminates.
+
+    Returns:
+        The total number of updated rows.
+    """
+    stmt = text(
+        f"UPDATE {table} SET {set_clause} WHERE rowid IN "
+        f"(SELECT rowid FROM {table} WHERE {where_clause} LIMIT :batch_size)"
+    )
+    total = 0
+    while True:
+        updated = conn.execute(stmt, {"batch_size": batch_size, **params}).rowcount
+        total += updated
+        if updated < batch_size:
+            return total
+
+
+def _add_habit_rollups(conn: Connection):
+    create_tables(conn, 'habit_rollups')
+    rebuild_habit_rollups(conn)
+
+
+def _add_balance_checkpoints(conn: Connection):
+    create_tables(conn, 'balance_checkpoints')
+    rebuild_balance_checkpoints(conn)
+
+
+def _add_transaction_import_hash(conn: Connection):
+    add_columns(conn, 'transactions', 'import_hash')
+    create_indexes(conn, 'ux_transactions_import_hash')
+
+
+def _add_goal_closure(conn: Connection):
+    create_tables(conn, 'goal_closure')
+    rebuild_goal_closure(conn)
+
+
+def _add_snapshot_changes(conn: Connection):
+    # Imported here so pyarrow is only loaded when the migration actually runs
+    from src.database.snapshots import create_change_triggers
+
+    create_tables(conn, 'snapshot_changes')
+    create_change_triggers(conn)
+
+
+def _add_search_index(conn: Connection):
+    create_tables(conn, 'search_docs')
+    create_search_index(conn)
+    rebuild_search_index(conn)
+
+
+def _add_task_scheduling(conn: Connection):
+    add_columns(conn, 'tasks', 'recurrence_key')
+    create_indexes(conn, 'ix_tasks_habit_id_due_date', 'ux_tasks_recurrence_key')
+    # Planning views range-scan is_completed = 0, which a NULL would fall out of
+    batched_update(conn, 'tasks', 'is_completed = 0', 'is_completed IS NULL')
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(
+        version=1,
+        description="Secondary indexes for date, account and parent lookups",
+        upgrade=lambda conn: create_indexes(
+            conn,
+            'ix_goals_parent_id',
+            'ix_habit_logs_log_date',
+            'ix_tasks_is_completed_due_date',
+            'ix_tasks_due_date',
+            'ix_tasks_goal_id',
+            'ix_transaction_tags_tag_name',
+            'ix_transactions_account_id_date',
+            'ix_transactions_date_id',
+        ),
+    ),
+    Migration(
+        version=2,
+        description="Habit rollup table, backfilled from existing logs",
+        upgrade=lambda conn: _add_habit_rollups(conn),
+    ),
+    Migration(
+        version=3,
+        description="Monthly account balance checkpoints",
+        upgrade=lambda conn: _add_balance_checkpoints(conn),
+    ),
+    Migration(
+        version=4,
+        description="Content hash on transactions for import de-duplication",
+        upgrade=lambda conn: _add_transaction_import_hash(conn),
+    ),
+    Migration(
+        version=5,
+        description="Goal hierarchy closure table",
+        upgrade=lambda conn: _add_goal_closure(conn),
+    ),
+    Migration(
+        version=6,
+        description="Change tracking for incremental Parquet snapshots",
+        upgrade=lambda conn: _add_snapshot_changes(conn),
+    ),
+    Migration(
+        version=7,
+        description="Monthly spending budgets per tag",
+        upgrade=lambda conn: create_tables(conn, 'budgets'),
+    ),
+    Migration(
+        version=8,
+        description="Full-text search index over transactions, tasks, goals and habits",
+        upgrade=lambda conn: _add_search_index(conn),
+    ),
+    Migration(
+        version=9,
+        description="Recurrence keys and habit/due date index for task scheduling",
+        upgrade=lambda conn: _add_task_scheduling(conn),
+    ),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def upgrade_database(engine: Engine) -> int:
+    """
+    Apply every pending migration to the database behind `engine`.
+
+    Each migration runs in its own transaction together with the version bump,
+    so an interrupted upgrade resumes from the last completed step.
+
+    Returns:
+        The schema version after the upgrade.
+    """
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            set_schema_version(conn, migration.version)
+        current = migration.version
+        logger.info("Migrated %s to schema version %s: %s", engine.url, current, migration.description)
+
+    return current
@@ -0,0 +1,178 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import re
+import threading
+from collections import Counter
+from typing import Any, Callable, Iterable, Sequence
+
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+
+# First table written by an INSERT/UPDATE/DELETE, including text() statements
+# and "WITH ... INSERT INTO" forms. An upsert's "DO UPDATE SET" comes after
+# its "INSERT INTO <table>", so the earliest match is the target table.
+_WRITE_TARGET = re.compile(r'\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)', re.IGNORECASE)
+_WRITTEN_TABLES_KEY = "query_cache_written_tables"
+
+# Set in the __dict__ of every object the cache hands out. The models refuse
+# attribute writes on such an object (see utils.Base) and sessions refuse to
+# attach it, so no caller can change a snapshot other threads are reading.
+READ_ONLY_FLAG = "_query_cache_read_only"
+
+
+def is_read_only(instance: Any) -> bool:
+    return getattr(instance, "__dict__", {}).get(READ_ONLY_FLAG, False)
+
+
+def _refuse_read_only(session: Session, instance: Any):
+    if is_read_only(instance):
+        raise InvalidRequestError(
+            f"{type(instance).__name__} is a shared query cache snapshot and cannot be added to a session; "
+            "load it with session.get() to change it"
+        )
+
+
+event.listen(Session, "before_attach", _refuse_read_only)
+
+
+class QueryCache:
+    """
+    Read-through cache of small, rarely changing query results for one engine.
+
+    Every table has a version counter that is bumped when a transaction that
+    wrote to it commits, whichever code path issued the write. A cached
+    result is served while the versions of the tables it was read from are
+    unchanged. Results are loaded in a private session, detached and made
+    read-only, so one snapshot can be shared by every thread: setting an
+    attribute on a cached object raises AttributeError and adding it to a
+    session raises InvalidRequestError. The snapshots are ORM instances
+    rather than copies, so callers keep using the model classes.
+
+    Versions are tracked in-process: writes made by another process (for
+    example a command line import) are only seen once this process writes to
+    the same table or the cache is cleared.
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._versions: Counter[str] = Counter()
+        self._entries: dict[str, tuple[tuple[int, ...], tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        event.listen(engine, "after_cursor_execute", self._record_write)
+        event.listen(engine, "commit", self._bump_written_tables)
+        event.listen(engine, "rollback", self._forget_written_tables)
+
+    def _record_write(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip()[:6].upper() in ("SELECT", "PRAGMA"):
+            return
+        match = _WRITE_TARGET.search(statement)
+        if match:
+            conn.info.setdefault(_WRITTEN_TABLES_KEY, set()).add(match.group(1).lower())
+
+    def _bump_written_tables(self, conn):
+        tables = conn.info.pop(_WRITTEN_TABLES_KEY, None)
+        if tables:
+            self.bump(*tables)
+
+    def _forget_written_tables(self, conn):
+        conn.info.pop(_WRITTEN_TABLES_KEY, None)
+
+    def bump(self, *tables: str):
+        """Invalidate every cached result that read from `tables`."""
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+
+    def version(self, table: str) -> int:
+        return self._versions[table]
+
+    def get_or_load(
+            self,
+            key: str,
+            tables: Iterable[str],
+            load: Callable[[Session], Sequence[Any]]
+    ) -> tuple:
+        """
+        Return the cached result for `key`, loading it if any of `tables` changed.
+
+        Args:
+            key: Name of the cached query.
+            tables: Tables the query reads from.
+            load: Runs the query against the given session.
+
+        Returns:
+            A tuple of detached, read-only result objects.
+        """
+        stamp, result = self.lookup(key, tables)
+        if result is not None:
+            return result
+
+        with Session(self.engine, expire_on_commit=False) as session:
+            result = tuple(load(session))
+            session.expunge_all()
+        self.store(key, stamp, result)
+        return result
+
+    def lookup(self, key: str, tables: Iterable[str]) -> tuple[tuple[int, ...], tuple | None]:
+        """
+        Return the current version stamp of `tables` and the cached result for `key` if it is still valid.
+
+        For callers that load the result themselves (e.g. through an async
+        session) and hand it back with store().
+        """
+        # Stamp before loading: a write that commits while we load leaves the
+        # entry tagged with the older versions, so it is reloaded next time.
+        stamp = tuple(self._versions[table] for table in tables)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            return stamp, entry[1]
+        self.misses += 1
+        return stamp, None
+
+    def store(self, key: str, stamp: tuple[int, ...], result: tuple):
+        for instance in result:
+            if hasattr(instance, "__dict__"):
+                instance.__dict__[READ_ONLY_FLAG] = True
+        self._entries[key] = (stamp, result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_caches: dict[Engine, QueryCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_query_cache(engine: Engine) -> QueryCache:
+    """Return the QueryCache of `engine`, installing its write listeners on first use."""
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            cache = _caches[engine] = QueryCache(engine)
+        return cache
+
+
+def discard_query_cache(engine: Engine):
+    """Drop the QueryCache of `engine` and its write listeners, e.g. when the engine is closed."""
+    with _caches_lock:
+        cache = _caches.pop(engine, None)
+    if cache is not None:
+        event.remove(engine, "after_cursor_execute", cache._record_write)
+        event.remove(engine, "commit", cache._bump_written_tables)
+        event.remove(engine, "rollback", cache._forget_written_tables)
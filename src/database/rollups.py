@@ -0,0 +1,177 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from datetime import date, timedelta
+from typing import Any
+
+from sqlalchemy import Connection, func, select, text, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.database.utils import Habit, HabitLog, HabitRollup
+
+# Seven bound parameters per rollup row keeps each upsert under SQLite's limit.
+ROLLUP_BATCH_SIZE = 4000
+
+EPOCH = date(1970, 1, 1)
+
+
+def period_bounds(log_date: date, target_period_in_days: int | None) -> dict[str, tuple[date, date]]:
+    """Return the (start, end) of every rollup period containing `log_date`."""
+    week_start = log_date - timedelta(days=log_date.weekday())
+    month_start = log_date.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+
+    period = max(target_period_in_days or 1, 1)
+    target_start = EPOCH + timedelta(days=(log_date - EPOCH).days // period * period)
+
+    return {
+        "WEEK": (week_start, week_start + timedelta(days=6)),
+        "MONTH": (month_start, next_month - timedelta(days=1)),
+        "TARGET": (target_start, target_start + timedelta(days=period - 1)),
+    }
+
+
+def get_previous_values(session: Session, rows: list[dict[str, Any]]) -> dict[tuple[str, date], float | None]:
+    """Fetch the currently stored value of every (habit_id, log_date) in `rows` that exists."""
+    keys = [(row["habit_id"], row["log_date"]) for row in rows]
+    existing = session.execute(
+        select(HabitLog.habit_id, HabitLog.log_date, HabitLog.value)
+        .where(tuple_(HabitLog.habit_id, HabitLog.log_date).in_(keys))
+    ).all()
+    return {(habit_id, log_date): value for habit_id, log_date, value in existing}
+
+
+def apply_habit_log_changes(
+        session: Session,
+        rows: list[dict[str, Any]],
+        previous_values: dict[tuple[str, date], float | None]
+):
+    """
+    Fold freshly written habit logs into the rollups as deltas.
+
+    Overwriting an existing log adds only the difference to the period total
+    and leaves the count unchanged. When an overwrite lowers a value the old
+    one may have been the period maximum, so those periods get their maximum
+    recomputed from the (indexed) logs.
+
+    Args:
+        session: Session holding the transaction that wrote the logs.
+        rows: The written logs as habit_id/log_date/value dicts.
+        previous_values: Values stored before the write, from get_previous_values.
+    """
+    habit_ids = {row["habit_id"] for row in rows}
+    target_periods = dict(session.execute(
+        select(Habit.id, Habit.target_period_in_days).where(Habit.id.in_(habit_ids))
+    ).all())
+
+    deltas: dict[tuple[str, str, date], dict[str, Any]] = {}
+    stale_maxima = set()
+    for row in rows:
+        key = (row["habit_id"], row["log_date"])
+        new_value = row["value"] or 0.0
+        existed = key in previous_values
+        old_value = previous_values.get(key) or 0.0
+        if existed and old_value == new_value:
+            continue
+
+        bounds = period_bounds(row["log_date"], target_periods.get(row["habit_id"]))
+        for period_type, (period_start, period_end) in bounds.items():
+            rollup_key = (row["habit_id"], period_type, period_start)
+            delta = deltas.setdefault(rollup_key, {
+                "habit_id": row["habit_id"],
+                "period_type": period_type,
+                "period_start": period_start,
+                "period_end": period_end,
+                "total": 0.0,
+                "log_count": 0,
+                "max_value": new_value,
+            })
+            delta["total"] += new_value - old_value
+            delta["log_count"] += 0 if existed else 1
+            delta["max_value"] = max(delta["max_value"], new_value)
+            if existed and old_value > new_value:
+                stale_maxima.add(rollup_key)
+
+    delta_rows = list(deltas.values())
+    for start in range(0, len(delta_rows), ROLLUP_BATCH_SIZE):
+        stmt = sqlite_insert(HabitRollup).values(delta_rows[start:start + ROLLUP_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[HabitRollup.habit_id, HabitRollup.period_type, HabitRollup.period_start],
+            set_={
+                "total": HabitRollup.total + stmt.excluded.total,
+                "log_count": HabitRollup.log_count + stmt.excluded.log_count,
+                "max_value": func.max(HabitRollup.max_value, stmt.excluded.max_value),
+            },
+        )
+        session.execute(stmt)
+
+    if stale_maxima:
+        session.execute(
+            text(
+                "UPDATE habit_rollups SET max_value = ("
+                "SELECT MAX(COALESCE(value, 0)) FROM habit_logs "
+                "WHERE habit_id = :habit_id AND log_date BETWEEN habit_rollups.period_start AND habit_rollups.period_end"
+                ") WHERE habit_id = :habit_id AND period_type = :period_type AND period_start = :period_start"
+            ),
+            [
+                {"habit_id": habit_id, "period_type": period_type, "period_start": period_start.isoformat()}
+                for habit_id, period_type, period_start in stale_maxima
+            ],
+        )
+
+    logger.info("Applied %s habit rollup deltas (%s maxima recomputed)", len(delta_rows), len(stale_maxima))
+
+
+REBUILD_STATEMENTS = {
+    "WEEK": """
+        INSERT INTO habit_rollups (habit_id, period_type, period_start, period_end, total, log_count, max_value)
+        SELECT habit_id, 'WEEK', period_start, date(period_start, '+6 days'),
+               SUM(value), COUNT(*), MAX(value)
+        FROM (
+            SELECT habit_id, COALESCE(value, 0) AS value, date(log_date, '-6 days', 'weekday 1') AS period_start
+            FROM habit_logs
+        )
+        GROUP BY habit_id, period_start
+    """,
+    "MONTH": """
+        INSERT INTO habit_rollups (habit_id, period_type, period_start, period_end, total, log_count, max_value)
+        SELECT habit_id, 'MONTH', period_start, date(period_start, '+1 month', '-1 day'),
+               SUM(value), COUNT(*), MAX(value)
+        FROM (
+            SELECT habit_id, COALESCE(value, 0) AS value, date(log_date, 'start of month') AS period_start
+            FROM habit_logs
+        )
+        GROUP BY habit_id, period_start
+    """,
+    "TARGET": """
+        INSERT INTO habit_rollups (habit_id, period_type, period_start, period_end, total, log_count, max_value)
+        SELECT habit_id, 'TARGET', period_start, date(period_start, '+' || (period - 1) || ' days'),
+               SUM(value), COUNT(*), MAX(value)
+        FROM (
+            SELECT l.habit_id, COALESCE(l.value, 0) AS value, h.period,
+                   date('1970-01-01', '+' || (CAST(julianday(l.log_date) - 2440587.5 AS INTEGER) / h.period * h.period) || ' days') AS period_start
+            FROM habit_logs l
+            JOIN (SELECT id, MAX(COALESCE(target_period_in_days, 1), 1) AS period FROM habits) h ON h.id = l.habit_id
+        )
+        GROUP BY habit_id, period_start
+    """,
+}
+
+
+def rebuild_habit_rollups(conn: Connection):
+    """Drop and regenerate every habit rollup from habit_logs with set-based SQL."""
+    conn.execute(text("DELETE FROM habit_rollups"))
+    for period_type, statement in REBUILD_STATEMENTS.items():
+        inserted = conn.execute(text(statement)).rowcount
+        logger.info("Rebuilt %s %s habit rollups", inserted, period_type)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from src.logging_config import setup_logging
+    from src.database.utils import DbOps
+    setup_logging()
+
+    DbOps(sys.argv[1] if len(sys.argv) > 1 else "prod.db").rebuild_habit_rollups()
@@ -0,0 +1,162 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from uuid import uuid4
+
+from sqlalchemy import Select, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.database.utils import Habit, Task
+
+# Every view is a range over ix_tasks_is_completed_due_date, read in index
+# order; tasks without a due date never show up in a planning view.
+
+
+@dataclass(frozen=True)
+class TaskAgenda:
+    today: date
+    overdue: list[Task]  # oldest first
+    due_today: list[Task]
+    upcoming: list[Task]  # due after today, within the horizon
+    overdue_count: int  # all overdue tasks, including those cut off by the limit
+
+
+def open_tasks_query(
+        after: date | None = None,
+        until: date | None = None,
+        limit: int | None = None,
+) -> Select:
+    """Open tasks due after `after` and on or before `until`, soonest first."""
+    stmt = select(Task).where(Task.is_completed == False)  # noqa: E712
+    if after is not None:
+        stmt = stmt.where(Task.due_date > after)
+    if until is not None:
+        stmt = stmt.where(Task.due_date <= until)
+    else:
+        stmt = stmt.where(Task.due_date.is_not(None))
+    stmt = stmt.order_by(Task.due_date, Task.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def overdue_tasks(session: Session, today: date, limit: int | None = None) -> list[Task]:
+    """Open tasks due before `today`, oldest first."""
+    return list(session.execute(open_tasks_query(until=today - timedelta(days=1), limit=limit)).scalars())
+
+
+def tasks_due_on(session: Session, day: date) -> list[Task]:
+    """Open tasks due on `day`."""
+    return list(session.execute(open_tasks_query(after=day - timedelta(days=1), until=day)).scalars())
+
+
+def upcoming_tasks(session: Session, today: date, days: int = 7, limit: int | None = None) -> list[Task]:
+    """Open tasks due in the `days` days after `today`, soonest first."""
+    return list(session.execute(open_tasks_query(after=today, until=today + timedelta(days=days), limit=limit)).scalars())
+
+
+def task_agenda(session: Session, today: date, days: int = 7, limit: int | None = None) -> TaskAgenda:
+    """
+    Overdue, due today and upcoming open tasks for a planning view.
+
+    Args:
+        session: Database session.
+        today: Day the agenda is for.
+        days: Number of days after `today` included in `upcoming`.
+        limit: Maximum number of tasks in each of `overdue` and `upcoming`.
+
+    Returns:
+        The three views, each read with one index range scan, plus the total
+        number of overdue tasks.
+    """
+    overdue_count = session.execute(
+        select(func.count())
+        .select_from(Task)
+        .where(Task.is_completed == False, Task.due_date < today)  # noqa: E712
+    ).scalar_one()
+    return TaskAgenda(
+        today=today,
+        overdue=overdue_tasks(session, today, limit),
+        due_today=tasks_due_on(session, today),
+        upcoming=upcoming_tasks(session, today, days, limit),
+        overdue_count=overdue_count,
+    )
+
+
+def recurrence_key(habit_id: str, due_date: date) -> str:
+    return f"{habit_id}:{due_date.isoformat()}"
+
+
+def _due_dates(period: int, start: date, end: date, last_due: date | None) -> list[date]:
+    """Dates every `period` days in [start, end), continuing the cadence of `last_due` if there is one."""
+    first = start
+    if last_due is not None:
+        first = last_due + timedelta(days=period)
+        if first < start:
+            # Skip the periods missed while nothing was generated, keeping the same weekday/phase
+            first += timedelta(days=-((first - start).days // period) * period)
+    return [first + timedelta(days=offset) for offset in range(0, (end - first).days, period)]
+
+
+def generate_recurring_tasks(session: Session, start: date, days: int = 28, xp: int = 0) -> int:
+    """
+    Create one task per period for every habit over the horizon [start, start + days).
+
+    A habit with target_period_in_days = 7 gets a task every 7 days. The
+    cadence continues from the habit's latest generated task, so reruns with
+    a later `start` extend the schedule instead of shifting it. Negative
+    habits (things to avoid) get no tasks.
+
+    Each generated task carries a unique recurrence key (habit id and due
+    date) and all of them are written with one batched INSERT ... ON
+    CONFLICT DO NOTHING, so rerunning over an overlapping horizon never
+    creates duplicates. Runs inside the caller's transaction.
+
+    Args:
+        session: Session holding the transaction.
+        start: First day of the horizon.
+        days: Length of the horizon in days.
+        xp: XP awarded by each generated task.
+
+    Returns:
+        The number of tasks created.
+    """
+    end = start + timedelta(days=days)
+    habits = session.execute(
+        select(Habit.id, Habit.name, Habit.description, Habit.target_period_in_days)
+        .where(Habit.target_period_in_days > 0, or_(Habit.is_negative_habit.is_(None), Habit.is_negative_habit == False))  # noqa: E712
+    ).all()
+    # Latest generated task per habit, from the (habit_id, due_date) index
+    last_due = dict(session.execute(
+        select(Task.habit_id, func.max(Task.due_date))
+        .where(Task.habit_id.is_not(None), Task.recurrence_key.is_not(None))
+        .group_by(Task.habit_id)
+    ).all())
+
+    rows = [
+        {
+            "id": str(uuid4()),
+            "title": name,
+            "description": description,
+            "is_completed": False,
+            "habit_id": habit_id,
+            "xp": xp,
+            "due_date": due_date,
+            "recurrence_key": recurrence_key(habit_id, due_date),
+        }
+        for habit_id, name, description, period in habits
+        for due_date in _due_dates(period, start, end, last_due.get(habit_id))
+    ]
+    if not rows:
+        return 0
+
+    table = Task.__table__
+    created = session.execute(
+        sqlite_insert(table).on_conflict_do_nothing(index_elements=[table.c.recurrence_key]).returning(table.c.id),
+        rows,
+    ).all()
+    logger.info("Generated %s recurring tasks for %s habits until %s", len(created), len(habits), end)
+    return len(created)
@@ -0,0 +1,167 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import re
+from dataclasses import dataclass
+from typing import Iterable
+
+from sqlalchemy import Connection, text
+from sqlalchemy.orm import Session
+
+
+@dataclass(frozen=True)
+class SearchSource:
+    kind: str
+    table: str
+    title_column: str
+    body_column: str | None
+
+
+SEARCH_SOURCES: list[SearchSource] = [
+    SearchSource("transaction", "transactions", "description", None),
+    SearchSource("task", "tasks", "title", "description"),
+    SearchSource("goal", "goals", "name", "description"),
+    SearchSource("habit", "habits", "name", "description"),
+]
+
+# Titles weigh more than bodies in the bm25 ranking
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+CREATE_SEARCH_INDEX_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+SEARCH_SQL = f"""
+    SELECT d.kind, d.ref_id,
+           highlight(search_index, 0, '**', '**'),
+           snippet(search_index, 1, '**', '**', '…', 12),
+           bm25(search_index, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank
+    FROM search_index
+    JOIN search_docs d ON d.id = search_index.rowid
+    WHERE search_index MATCH :query {{kind_filter}}
+    ORDER BY rank
+    LIMIT :limit OFFSET :offset
+"""
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    kind: str
+    ref_id: str
+    title: str  # with matched terms wrapped in **
+    snippet: str | None  # best-matching fragment of the body; None for transactions and empty descriptions
+    rank: float  # bm25 score, lower is better
+
+
+@dataclass(frozen=True)
+class SearchPage:
+    results: list[SearchResult]
+    offset: int
+    has_more: bool
+
+
+def _body(source: SearchSource, row: str) -> str:
+    return f"{row}.{source.body_column}" if source.body_column else "NULL"
+
+
+def _search_triggers() -> dict[str, str]:
+    """DDL of the triggers that keep search_docs and search_index in step with each source table."""
+    triggers = {}
+    for source in SEARCH_SOURCES:
+        doc_id = f"(SELECT id FROM search_docs WHERE kind = '{source.kind}' AND ref_id = {{row}}.id)"
+        columns = ", ".join(filter(None, (source.title_column, source.body_column)))
+        triggers[f"search_{source.table}_insert"] = (
+            f"AFTER INSERT ON {source.table} BEGIN "
+            f"INSERT INTO search_docs (kind, ref_id) VALUES ('{source.kind}', NEW.id); "
+            # Inside a trigger, last_insert_rowid() is the search_docs row just added
+            f"INSERT INTO search_index (rowid, title, body) "
+            f"VALUES (last_insert_rowid(), NEW.{source.title_column}, {_body(source, 'NEW')}); END"
+        )
+        # Only text edits touch the index; e.g. completing a task does not
+        triggers[f"search_{source.table}_update"] = (
+            f"AFTER UPDATE OF {columns} ON {source.table} BEGIN "
+            f"UPDATE search_index SET title = NEW.{source.title_column}, body = {_body(source, 'NEW')} "
+            f"WHERE rowid = {doc_id.format(row='OLD')}; END"
+        )
+        triggers[f"search_{source.table}_delete"] = (
+            f"AFTER DELETE ON {source.table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = {doc_id.format(row='OLD')}; "
+            f"DELETE FROM search_docs WHERE kind = '{source.kind}' AND ref_id = OLD.id; END"
+        )
+    return triggers
+
+
+def create_search_index(conn: Connection):
+    """Create the FTS5 table and its sync triggers if missing."""
+    conn.execute(text(CREATE_SEARCH_INDEX_SQL))
+    for name, body in _search_triggers().items():
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+        logger.info("Ensured trigger %s", name)
+
+
+def rebuild_search_index(conn: Connection):
+    """Drop and regenerate every search document from the source tables with set-based SQL."""
+    conn.execute(text("DELETE FROM search_index"))
+    conn.execute(text("DELETE FROM search_docs"))
+    for source in SEARCH_SOURCES:
+        conn.execute(text(f"INSERT INTO search_docs (kind, ref_id) SELECT '{source.kind}', id FROM {source.table}"))
+        inserted = conn.execute(text(
+            f"INSERT INTO search_index (rowid, title, body) "
+            f"SELECT d.id, s.{source.title_column}, {_body(source, 's')} "
+            f"FROM {source.table} s JOIN search_docs d ON d.kind = '{source.kind}' AND d.ref_id = s.id"
+        )).rowcount
+        logger.info("Indexed %s %s rows for search", inserted, source.kind)
+    conn.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+
+
+def match_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Quoting each word keeps user input from being parsed as FTS5 syntax
+    (operators, column filters, unbalanced quotes).
+    """
+    return " ".join(f'"{token}"*' for token in _TOKEN.findall(query))
+
+
+def search(
+        session: Session,
+        query: str,
+        kinds: Iterable[str] | None = None,
+        limit: int = 20,
+        offset: int = 0,
+) -> SearchPage:
+    """
+    Ranked full-text search over transaction descriptions and task, goal and habit names and descriptions.
+
+    Args:
+        session: Database session.
+        query: Free text; each word matches as a prefix.
+        kinds: Restrict results to these kinds (transaction, task, goal, habit).
+        limit: Page size.
+        offset: Number of results to skip.
+
+    Returns:
+        One page of results, best match first.
+    """
+    fts_query = match_query(query)
+    if not fts_query:
+        return SearchPage(results=[], offset=offset, has_more=False)
+
+    params = {"query": fts_query, "limit": limit + 1, "offset": offset}
+    kind_filter = ""
+    if kinds is not None:
+        kinds = list(kinds)
+        kind_filter = f"AND d.kind IN ({', '.join(f':kind_{index}' for index in range(len(kinds)))})" if kinds else "AND 0"
+        params.update({f"kind_{index}": kind for index, kind in enumerate(kinds)})
+
+    rows = session.execute(text(SEARCH_SQL.format(kind_filter=kind_filter)), params).all()
+    return SearchPage(
+        results=[SearchResult(*row) for row in rows[:limit]],
+        offset=offset,
+        has_more=len(rows) > limit,
+    )
@@ -0,0 +1,309 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import Connection, text
+
+from src.database.instrumentation import recorded
+from src.database.utils import DbOps, db_folder
+
+DEFAULT_EXPORT_DIR = Path(db_folder) / "snapshots"
+MANIFEST_NAME = "_manifest.json"
+PARTITION_COLUMN = "month"
+UNDATED_PARTITION = "undated"
+TAG_SEPARATOR = "\x1f"
+
+
+@dataclass(frozen=True)
+class SnapshotTable:
+    """An exported table, split into one Parquet file per month of `date_column`."""
+    name: str
+    date_column: str
+    schema: pa.Schema
+    # Selects the schema's columns in order; {where} restricts it to one partition
+    query: str
+
+
+SNAPSHOT_TABLES: list[SnapshotTable] = [
+    SnapshotTable(
+        name="habit_logs",
+        date_column="log_date",
+        schema=pa.schema([
+            ("habit_id", pa.string()),
+            ("log_date", pa.date32()),
+            ("value", pa.float64()),
+        ]),
+        query="SELECT habit_id, log_date, value FROM habit_logs WHERE {where} ORDER BY log_date, habit_id",
+    ),
+    SnapshotTable(
+        name="transactions",
+        date_column="date",
+        schema=pa.schema([
+            ("id", pa.string()),
+            ("account_id", pa.string()),
+            ("amount", pa.float64()),
+            ("date", pa.date32()),
+            ("description", pa.string()),
+            ("tags", pa.list_(pa.string())),
+        ]),
+        query=(
+            "SELECT t.id, t.account_id, t.amount, t.date, t.description, "
+            f"(SELECT group_concat(tt.tag_name, char({ord(TAG_SEPARATOR)})) FROM transaction_tags tt WHERE tt.transaction_id = t.id) "
+            "FROM transactions t WHERE {where} ORDER BY t.date, t.id"
+        ),
+    ),
+    SnapshotTable(
+        name="tasks",
+        date_column="due_date",
+        schema=pa.schema([
+            ("id", pa.string()),
+            ("title", pa.string()),
+            ("description", pa.string()),
+            ("is_completed", pa.bool_()),
+            ("goal_id", pa.string()),
+            ("grind_id", pa.string()),
+            ("habit_id", pa.string()),
+            ("xp", pa.int64()),
+            ("due_date", pa.date32()),
+        ]),
+        query=(
+            "SELECT id, title, description, is_completed, goal_id, grind_id, habit_id, xp, due_date "
+            "FROM tasks WHERE {where} ORDER BY due_date, id"
+        ),
+    ),
+]
+
+
+def _partition_sql(column: str) -> str:
+    return f"COALESCE(strftime('%Y-%m', {column}), '{UNDATED_PARTITION}')"
+
+
+def _mark_sql(table_name: str, partition: str) -> str:
+    # A no-op lookup when the partition is already marked, which keeps bulk writes cheap. An upsert
+    # clause rather than INSERT OR IGNORE, which an outer upsert's conflict handling would override.
+    return f"INSERT INTO snapshot_changes (table_name, partition_key) VALUES ('{table_name}', {partition}) ON CONFLICT DO NOTHING;"
+
+
+def _change_triggers() -> dict[str, str]:
+    """DDL of the triggers that mark a partition dirty whenever one of its rows is written."""
+    triggers = {}
+    for table in SNAPSHOT_TABLES:
+        new_mark = _mark_sql(table.name, _partition_sql(f"NEW.{table.date_column}"))
+        old_mark = _mark_sql(table.name, _partition_sql(f"OLD.{table.date_column}"))
+        triggers[f"snapshot_{table.name}_insert"] = f"AFTER INSERT ON {table.name} BEGIN {new_mark} END"
+        triggers[f"snapshot_{table.name}_update"] = f"AFTER UPDATE ON {table.name} BEGIN {new_mark} {old_mark} END"
+        triggers[f"snapshot_{table.name}_delete"] = f"AFTER DELETE ON {table.name} BEGIN {old_mark} END"
+    # Tags are exported as a column of transactions
+    for event, row in (("insert", "NEW"), ("delete", "OLD")):
+        triggers[f"snapshot_transaction_tags_{event}"] = (
+            f"AFTER {event.upper()} ON transaction_tags BEGIN "
+            "INSERT INTO snapshot_changes (table_name, partition_key) "
+            f"SELECT 'transactions', {_partition_sql('date')} FROM transactions WHERE id = {row}.transaction_id "
+            "ON CONFLICT DO NOTHING; END"
+        )
+    return triggers
+
+
+def create_change_triggers(conn: Connection):
+    for name, body in _change_triggers().items():
+        conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+        logger.info("Ensured trigger %s", name)
+
+
+def _partition_bounds(partition: str) -> tuple[str, str]:
+    year, month = map(int, partition.split("-"))
+    end = date(year + month // 12, month % 12 + 1, 1)
+    return date(year, month, 1).isoformat(), end.isoformat()
+
+
+def _to_arrow(rows: list[tuple], schema: pa.Schema) -> pa.Table:
+    """Build a table from raw DBAPI rows, parsing SQLite's text dates and 0/1 booleans in Arrow."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for values, field in zip(columns, schema):
+        if field.type == pa.date32():
+            array = pa.array(values, pa.string()).cast(pa.date32())
+        elif field.type == pa.bool_():
+            array = pa.array(values, pa.int64()).cast(pa.bool_())
+        elif pa.types.is_list(field.type):
+            array = pc.fill_null(pc.split_pattern(pa.array(values, pa.string()), TAG_SEPARATOR), pa.scalar([], field.type))
+        else:
+            array = pa.array(values, field.type)
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _write_partition(cursor, table: SnapshotTable, export_dir: Path, partition: str) -> int:
+    """Rewrite one partition file from the database; returns its row count."""
+    if partition == UNDATED_PARTITION:
+        where, params = f"{table.date_column} IS NULL", []
+    else:
+        where, params = f"{table.date_column} >= ? AND {table.date_column} < ?", list(_partition_bounds(partition))
+    sql = table.query.format(where=where)
+    with recorded(sql):
+        rows = cursor.execute(sql, params).fetchall()
+
+    partition_dir = export_dir / table.name / f"{PARTITION_COLUMN}={partition}"
+    if not rows:
+        shutil.rmtree(partition_dir, ignore_errors=True)
+        return 0
+
+    partition_dir.mkdir(parents=True, exist_ok=True)
+    # Readers skip dot-files, so they never see a half-written partition
+    tmp_path = partition_dir / ".part-0.parquet.tmp"
+    pq.write_table(_to_arrow(rows, table.schema), tmp_path, compression="zstd")
+    os.replace(tmp_path, partition_dir / "part-0.parquet")
+    return len(rows)
+
+
+def _read_manifest(export_dir: Path) -> dict:
+    path = export_dir / MANIFEST_NAME
+    if path.exists():
+        return json.loads(path.read_text())
+    return {"tables": {}}
+
+
+def _write_manifest(export_dir: Path, manifest: dict):
+    export_dir.mkdir(parents=True, exist_ok=True)
+    (export_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+
+def export_snapshots(db_ops: DbOps, export_dir: str | Path = DEFAULT_EXPORT_DIR, full: bool = False) -> dict[str, int]:
+    """
+    Bring the Parquet snapshots in `export_dir` up to date with the database.
+
+    Only the monthly partitions marked in snapshot_changes since the last
+    export are rewritten. A table is exported in full the first time, after
+    an interrupted export, or when `full` is set, since those partitions may
+    not be marked.
+
+    Args:
+        db_ops: Database handle.
+        export_dir: Root directory of the snapshots, one subdirectory per table.
+        full: Rewrite every partition instead of only the changed ones.
+
+    Returns:
+        The number of rows written per table.
+    """
+    export_dir = Path(export_dir)
+    manifest = _read_manifest(export_dir)
+    written = {}
+
+    for table in SNAPSHOT_TABLES:
+        needs_full = full or not manifest["tables"].get(table.name, {}).get("complete", False)
+        # Flagged incomplete first: if we stop after claiming the marks, the next run starts over in full
+        manifest["tables"][table.name] = {"complete": False}
+        _write_manifest(export_dir, manifest)
+
+        # Claim the marks before reading any rows; a write that lands after
+        # this marks its partition again and is picked up by the next export.
+        claimed = set(db_ops.db.execute(
+            text("DELETE FROM snapshot_changes WHERE table_name = :table_name RETURNING partition_key"),
+            {"table_name": table.name},
+        ).scalars())
+        db_ops.db.commit()
+
+        cursor = db_ops.db.connection().connection.cursor()
+        try:
+            if needs_full:
+                sql = f"SELECT DISTINCT {_partition_sql(table.date_column)} FROM {table.name}"
+                with recorded(sql):
+                    partitions = {row[0] for row in cursor.execute(sql)}
+                table_dir = export_dir / table.name
+                if table_dir.exists():
+                    # Also revisit partitions that no longer have rows, so they get removed
+                    partitions |= {path.name.split("=", 1)[1] for path in table_dir.glob(f"{PARTITION_COLUMN}=*")}
+            else:
+                partitions = claimed
+            written[table.name] = sum(_write_partition(cursor, table, export_dir, partition) for partition in sorted(partitions))
+        finally:
+            cursor.close()
+
+        manifest["tables"][table.name] = {
+            "complete": True,
+            "exported_at": datetime.now().isoformat(timespec="seconds"),
+            "partitions_written": len(partitions),
+            "rows_written": written[table.name],
+        }
+        _write_manifest(export_dir, manifest)
+        logger.info("Exported %s rows of %s across %s partition(s)", written[table.name], table.name, len(partitions))
+
+    return written
+
+
+def read_snapshot(
+        table_name: str,
+        export_dir: str | Path = DEFAULT_EXPORT_DIR,
+        columns: Sequence[str] | None = None,
+        start: date | None = None,
+        end: date | None = None,
+) -> pa.Table:
+    """
+    Load an exported table as Arrow, without touching SQLite.
+
+    Args:
+        table_name: One of habit_logs, transactions or tasks.
+        export_dir: Root directory passed to export_snapshots.
+        columns: Columns to read. Defaults to all of them.
+        start: Earliest date to include, inclusive. Only matching month partitions are opened.
+        end: Latest date to include, inclusive.
+
+    Returns:
+        The snapshot rows; the table is empty if nothing was exported yet.
+    """
+    table = next(table for table in SNAPSHOT_TABLES if table.name == table_name)
+    table_dir = Path(export_dir) / table.name
+    if not table_dir.exists():
+        return table.schema.empty_table().select(columns or table.schema.names)
+
+    dataset = ds.dataset(
+        table_dir,
+        schema=table.schema.append(pa.field(PARTITION_COLUMN, pa.string())),
+        format="parquet",
+        partitioning="hive",
+    )
+    condition = None
+    if start is not None:
+        condition = (ds.field(PARTITION_COLUMN) >= start.strftime("%Y-%m")) & (ds.field(table.date_column) >= start)
+    if end is not None:
+        upper = (ds.field(PARTITION_COLUMN) <= end.strftime("%Y-%m")) & (ds.field(table.date_column) <= end)
+        condition = upper if condition is None else condition & upper
+    return dataset.to_table(columns=list(columns or table.schema.names), filter=condition)
+
+
+def read_snapshot_pandas(
+        table_name: str,
+        export_dir: str | Path = DEFAULT_EXPORT_DIR,
+        columns: Sequence[str] | None = None,
+        start: date | None = None,
+        end: date | None = None,
+) -> pd.DataFrame:
+    """read_snapshot as a DataFrame backed by the Arrow buffers (pd.ArrowDtype columns), so no per-value Python objects are built."""
+    return read_snapshot(table_name, export_dir, columns, start, end).to_pandas(types_mapper=pd.ArrowDtype)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.logging_config import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Export habit logs, transactions and tasks to partitioned Parquet.")
+    parser.add_argument("db_name", nargs="?", default="prod.db")
+    parser.add_argument("--dir", type=Path, default=DEFAULT_EXPORT_DIR)
+    parser.add_argument("--full", action="store_true", help="rewrite every partition")
+    args = parser.parse_args()
+
+    print(export_snapshots(DbOps(args.db_name), args.dir, args.full))
@@ -0,0 +1,182 @@
+import logging
+logger = logging.getLogger(__name__)
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from src.database.instrumentation import recorded
+
+# Positive amounts are money leaving an account (see ledger.py), so spending
+# is the sum of positive amounts and refunds/income are left out.
+UNTAGGED = "(untagged)"
+ALL_SPENDING = "All"
+
+_GROUP_KEYS = {
+    "tag": f"COALESCE(tt.tag_name, '{UNTAGGED}')",
+    "account": "t.account_id",
+    None: f"'{ALL_SPENDING}'",
+}
+
+# Spending per (month, key) over a dense month x key grid, so months without
+# spending count as 0 in the trailing average computed by the window function.
+SPENDING_BY_MONTH_SQL = """
+    WITH RECURSIVE months(month) AS (
+        SELECT :first_month
+        UNION ALL
+        SELECT strftime('%Y-%m', date(month || '-01', '+1 month')) FROM months WHERE month < :last_month
+    ),
+    totals AS (
+        SELECT strftime('%Y-%m', t.date) AS month, {key} AS key, SUM(t.amount) AS total, COUNT(*) AS n
+        FROM transactions t {join}
+        WHERE t.amount > 0 AND t.date >= :start AND t.date <= :end {account_filter}
+        GROUP BY month, key
+    ),
+    keys AS (SELECT DISTINCT key FROM totals)
+    SELECT m.month, k.key, COALESCE(s.total, 0), COALESCE(s.n, 0),
+           AVG(COALESCE(s.total, 0)) OVER (PARTITION BY k.key ORDER BY m.month ROWS BETWEEN {preceding} PRECEDING AND CURRENT ROW)
+    FROM months m
+    CROSS JOIN keys k
+    LEFT JOIN totals s ON s.month = m.month AND s.key = k.key
+    ORDER BY k.key, m.month
+"""
+
+BUDGET_VS_ACTUAL_SQL = """
+    SELECT b.tag_name, b.monthly_limit, COALESCE(SUM(t.amount), 0)
+    FROM budgets b
+    LEFT JOIN transaction_tags tt ON tt.tag_name = b.tag_name
+    LEFT JOIN transactions t ON t.id = tt.transaction_id AND t.amount > 0 AND t.date >= :start AND t.date < :end
+    GROUP BY b.tag_name
+    ORDER BY b.tag_name
+"""
+
+
+@dataclass(frozen=True)
+class SpendingBreakdown:
+    """One row per (key, month), keys grouped together and months ascending within each key."""
+    group_by: str | None
+    months: np.ndarray  # datetime64[M]
+    keys: np.ndarray  # str: tag name, account id, or "All"
+    totals: np.ndarray  # float64, spending in the month
+    counts: np.ndarray  # int64, number of spending transactions
+    rolling_average: np.ndarray  # float64, mean monthly spending over the trailing window
+
+    def for_key(self, key: str) -> "SpendingBreakdown":
+        mask = self.keys == key
+        return SpendingBreakdown(
+            self.group_by, self.months[mask], self.keys[mask], self.totals[mask], self.counts[mask], self.rolling_average[mask]
+        )
+
+
+@dataclass(frozen=True)
+class BudgetReport:
+    month: date
+    tags: np.ndarray  # str
+    budgets: np.ndarray  # float64, monthly limit
+    actual: np.ndarray  # float64, spending in the month
+
+    @property
+    def remaining(self) -> np.ndarray:
+        return self.budgets - self.actual
+
+    @property
+    def used(self) -> np.ndarray:
+        """Fraction of each budget spent; inf for a zero budget with spending."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.budgets > 0, self.actual / self.budgets, np.where(self.actual > 0, np.inf, 0.0))
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def spending_by_month(
+        session: Session,
+        start: date,
+        end: date,
+        group_by: str | None = "tag",
+        account_ids: Iterable[str] | None = None,
+        window: int = 3,
+) -> SpendingBreakdown:
+    """
+    Aggregate spending by month and tag, account or in total, entirely in SQL.
+
+    Only the aggregated rows (months x keys) leave SQLite; no transaction
+    is materialized. A transaction with several tags counts towards each of
+    them. Untagged spending is reported under "(untagged)".
+
+    Args:
+        session: Database session.
+        start: First day included.
+        end: Last day included.
+        group_by: "tag", "account", or None for a single total.
+        account_ids: Only include transactions from these accounts.
+        window: Number of months in the trailing rolling average.
+
+    Returns:
+        A SpendingBreakdown with one row per key and month from start to end.
+    """
+    if group_by not in _GROUP_KEYS:
+        raise ValueError(f"group_by must be 'tag', 'account' or None, not {group_by!r}")
+
+    params = {
+        "first_month": start.strftime("%Y-%m"),
+        "last_month": end.strftime("%Y-%m"),
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+    }
+    account_filter = ""
+    if account_ids is not None:
+        account_ids = list(account_ids)
+        placeholders = ", ".join(f":account_{index}" for index in range(len(account_ids)))
+        account_filter = f"AND t.account_id IN ({placeholders})" if account_ids else "AND 0"
+        params.update({f"account_{index}": account_id for index, account_id in enumerate(account_ids)})
+
+    sql = SPENDING_BY_MONTH_SQL.format(
+        key=_GROUP_KEYS[group_by],
+        join="LEFT JOIN transaction_tags tt ON tt.transaction_id = t.id" if group_by == "tag" else "",
+        account_filter=account_filter,
+        preceding=max(int(window), 1) - 1,
+    )
+
+    cursor = session.connection().connection.cursor()
+    try:
+        with recorded(sql):
+            rows = cursor.execute(sql, params).fetchall()
+    finally:
+        cursor.close()
+
+    months, keys, totals, counts, rolling = zip(*rows) if rows else ((),) * 5
+    logger.debug("Aggregated spending into %s rows by %s", len(rows), group_by)
+    return SpendingBreakdown(
+        group_by=group_by,
+        months=np.array(months, dtype="datetime64[M]"),
+        keys=np.array(keys, dtype=str),
+        totals=np.array(totals, dtype=np.float64),
+        counts=np.array(counts, dtype=np.int64),
+        rolling_average=np.array(rolling, dtype=np.float64),
+    )
+
+
+def budget_vs_actual(session: Session, month: date) -> BudgetReport:
+    """Every budgeted tag's monthly limit against its spending in the month containing `month`."""
+    month_start = month.replace(day=1)
+    cursor = session.connection().connection.cursor()
+    try:
+        with recorded(BUDGET_VS_ACTUAL_SQL):
+            rows = cursor.execute(
+                BUDGET_VS_ACTUAL_SQL, {"start": month_start.isoformat(), "end": _next_month(month_start).isoformat()}
+            ).fetchall()
+    finally:
+        cursor.close()
+
+    tags, budgets, actual = zip(*rows) if rows else ((),) * 3
+    return BudgetReport(
+        month=month_start,
+        tags=np.array(tags, dtype=str),
+        budgets=np.array(budgets, dtype=np.float64),
+        actual=np.array(actual, dtype=np.float64),
+    )
@@ -0,0 +1,201 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+from sqlalchemy import Engine
+
+from src.database import utils
+from src.database.utils import DbOps, dispose_engine, get_engine
+
+# At most this many tenant databases are open at once; opening another one
+# closes the least recently used idle tenant first.
+TENANT_MAX_OPEN = int(os.environ.get("TENANT_MAX_OPEN", "64"))
+# Tenants unused for this long are closed even if the LRU is not full.
+TENANT_IDLE_SECONDS = float(os.environ.get("TENANT_IDLE_SECONDS", "600"))
+# A tenant with a checked-out connection that was used this recently is
+# treated as serving a request and is not evicted to make room.
+TENANT_BUSY_SECONDS = 30.0
+# Smaller pools and page caches than the single-user database, so that
+# TENANT_MAX_OPEN open tenants stay within file descriptor and memory limits.
+TENANT_POOL_SIZE = 2
+TENANT_POOL_MAX_OVERFLOW = 3
+TENANT_SQLITE_PRAGMAS = {
+    **utils.SQLITE_PRAGMAS,
+    "mmap_size": 32 * 1024 * 1024,
+    "cache_size": -8 * 1024,  # negative means KiB
+}
+
+# Tenant databases live in their own folder under db_folder
+TENANT_DIR = "tenants"
+_TENANT_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,127}")
+
+
+def tenant_db_name(tenant_id: str) -> str:
+    """
+    Database file of a tenant, relative to db_folder.
+
+    Raises:
+        ValueError: If the id could escape the tenant folder or is not a plain file name.
+    """
+    if not _TENANT_ID.fullmatch(tenant_id) or ".." in tenant_id:
+        raise ValueError(f"Invalid tenant id {tenant_id!r}")
+    return f"{TENANT_DIR}/{tenant_id}.db"
+
+
+@dataclass
+class _OpenTenant:
+    db_ops: DbOps
+    db_url: str
+    engine: Engine
+    last_used: float
+
+
+class TenantRouter:
+    """
+    Maps tenants to their own SQLite database and keeps an LRU of open ones.
+
+    A tenant's database file is created with the current schema the first
+    time it is used, and migrated when an existing file is opened. Each open
+    tenant holds one engine with a small connection pool. When
+    `max_open` tenants are open, the least recently used tenant without a
+    checked-out connection is closed before another one is opened; tenants
+    idle for `idle_seconds` are closed on the next lookup either way.
+
+    A closed tenant is simply reopened on its next lookup, so callers should
+    get the DbOps from the router for each unit of work instead of keeping it.
+    """
+
+    def __init__(self, max_open: int = TENANT_MAX_OPEN, idle_seconds: float = TENANT_IDLE_SECONDS):
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._open: OrderedDict[str, _OpenTenant] = OrderedDict()
+        self._lock = threading.Lock()
+        self._eviction_listeners: list[Callable[[str, str], None]] = []
+        self.opened = 0
+        self.evicted = 0
+
+    def add_eviction_listener(self, listener: Callable[[str, str], None]):
+        """Register `listener` to be called with (tenant_id, db_url) after a tenant is closed."""
+        if listener not in self._eviction_listeners:
+            self._eviction_listeners.append(listener)
+
+    def get(self, tenant_id: str) -> DbOps:
+        """Return the DbOps of `tenant_id`, opening (and if needed creating) its database."""
+        now = time.monotonic()
+        with self._lock:
+            tenant = self._open.get(tenant_id)
+            if tenant is not None:
+                self._open.move_to_end(tenant_id)
+                tenant.last_used = now
+                return tenant.db_ops
+
+            self._evict_idle(now)
+            while len(self._open) >= self.max_open and self._evict_lru(now):
+                pass
+            if len(self._open) >= self.max_open:
+                logger.warning("All %s open tenants are busy; opening %s above the limit", len(self._open), tenant_id)
+
+            tenant = self._open[tenant_id] = self._open_tenant(tenant_id, now)
+            self.opened += 1
+            return tenant.db_ops
+
+    def _open_tenant(self, tenant_id: str, now: float) -> _OpenTenant:
+        db_name = tenant_db_name(tenant_id)
+        os.makedirs(os.path.join(utils.db_folder, TENANT_DIR), exist_ok=True)
+        db_url = f'sqlite:///{utils.db_folder}/{db_name}'
+        # Creates the schema for a new tenant; DbOps then reuses the cached engine
+        engine = get_engine(db_url, TENANT_POOL_SIZE, TENANT_POOL_MAX_OVERFLOW, TENANT_SQLITE_PRAGMAS)
+        logger.info("Opened tenant %s", tenant_id)
+        return _OpenTenant(DbOps(db_name), db_url, engine, now)
+
+    def _is_busy(self, tenant: _OpenTenant, now: float) -> bool:
+        # A checked-out connection means a request may still be using the tenant;
+        # long after its last lookup it can only be a session nobody closed.
+        return tenant.engine.pool.checkedout() > 0 and now - tenant.last_used < TENANT_BUSY_SECONDS
+
+    def _evict_idle(self, now: float):
+        for tenant_id, tenant in list(self._open.items()):
+            if now - tenant.last_used < self.idle_seconds:
+                break  # ordered by last use
+            self._close(tenant_id)
+
+    def _evict_lru(self, now: float) -> bool:
+        for tenant_id, tenant in self._open.items():
+            if not self._is_busy(tenant, now):
+                self._close(tenant_id)
+                return True
+        return False
+
+    def _close(self, tenant_id: str):
+        tenant = self._open.pop(tenant_id)
+        dispose_engine(tenant.db_url)
+        self.evicted += 1
+        for listener in self._eviction_listeners:
+            listener(tenant_id, tenant.db_url)
+
+    def close(self, tenant_id: str):
+        """Close a tenant's database if it is open."""
+        with self._lock:
+            if tenant_id in self._open:
+                self._close(tenant_id)
+
+    def close_all(self):
+        with self._lock:
+            for tenant_id in list(self._open):
+                self._close(tenant_id)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"open": len(self._open), "opened": self.opened, "evicted": self.evicted}
+
+
+_router: TenantRouter | None = None
+_router_lock = threading.Lock()
+
+
+def get_tenant_router() -> TenantRouter:
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = TenantRouter()
+    return _router
+
+
+# Tenant of the calling thread; Streamlit runs each session's script in its own thread
+_current = threading.local()
+
+
+def set_current_tenant(tenant_id: str | None):
+    """
+    Route get_db_ops() (and `from src.database.utils import db_ops`) in this thread to `tenant_id`.
+
+    Call it at the top of a page script, before db_ops is imported. None
+    routes back to the production database.
+    """
+    if tenant_id is not None:
+        tenant_db_name(tenant_id)  # validate early
+    _current.tenant_id = tenant_id
+
+
+def current_tenant() -> str | None:
+    return getattr(_current, "tenant_id", None)
+
+
+@contextmanager
+def use_tenant(tenant_id: str) -> Iterator[DbOps]:
+    """Run a block against `tenant_id`'s database, e.g. in a script or background job."""
+    previous = current_tenant()
+    set_current_tenant(tenant_id)
+    try:
+        yield get_tenant_router().get(tenant_id)
+    finally:
+        set_current_tenant(previous)
@@ -1,22 +1,53 @@
 import logging
 logger = logging.getLogger(__name__)
 
+import functools
 import os
-from typing import Iterable, Sequence
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Sequence
 from uuid import uuid4
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, select, Date, Table
-from sqlalchemy.orm import sessionmaker, declarative_base, validates, relationship
+from sqlalchemy import Engine, Row, event, create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, select, Date, Table, Index, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, scoped_session, sessionmaker, declarative_base, validates, relationship, make_transient_to_detached, joinedload, selectinload
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.associationproxy import association_proxy
+
+from src.database.query_cache import READ_ONLY_FLAG, discard_query_cache, get_query_cache
+from src.database.instrumentation import instrument_engine
 from datetime import date
 
-Base = declarative_base()
+if TYPE_CHECKING:
+    import numpy as np
+    from src.database.scheduler import TaskAgenda
+    from src.database.search import SearchPage
+    from src.database.spending import BudgetReport, SpendingBreakdown
+
+
+class _Model:
+    def __setattr__(self, name, value):
+        # Objects from the query cache are shared by every thread; see QueryCache
+        if self.__dict__.get(READ_ONLY_FLAG):
+            raise AttributeError(
+                f"{type(self).__name__} is a shared query cache snapshot and is read-only; "
+                f"load it with session.get() to change {name}"
+            )
+        super().__setattr__(name, value)
+
+
+Base = declarative_base(cls=_Model)
 
 from pathlib import Path
 
 db_folder = str(Path(__file__).parent)
 
+# SQLite caps bound parameters per statement; three are used per habit log row.
+UPSERT_BATCH_SIZE = 5000
+# Rows fetched per round trip when streaming habit logs
+HABIT_LOG_CHUNK_SIZE = 10_000
+
 
 class XPProgression(Base):
     __tablename__ = 'xp_progressions'
@@ -30,11 +61,26 @@ class XPProgression(Base):
     @validates('type')
     def validate_type(self, key, value):
         assert value in ("LINEAR", "EXPONENTIAL"), "XPProgression type must be LINEAR or EXPONENTIAL"
+        self._check_exponential_rate(value, self.rate)
+        return value
+
+    @validates('rate')
+    def validate_rate(self, key, value):
+        self._check_exponential_rate(self.type, value)
         return value
 
+    @staticmethod
+    def _check_exponential_rate(xp_type: str | None, rate: float | None):
+        # With rate < 1 level costs shrink and total XP converges to base / (1 - rate),
+        # so there is no level for XP past that bound.
+        assert xp_type != "EXPONENTIAL" or rate is None or rate > 1, "EXPONENTIAL XPProgression rate must be greater than 1"
+
 
 class Goal(Base):
     __tablename__ = 'goals'
+    __table_args__ = (
+        Index('ix_goals_parent_id', 'parent_id'),
+    )
     id = Column(String, primary_key=True)
     name = Column(String)
     description = Column(String)
@@ -43,6 +89,18 @@ class Goal(Base):
     due_date = Column(Date)
 
 
+class GoalClosure(Base):
+    """One row per (ancestor, descendant) pair of the goal tree, including each goal with itself."""
+    __tablename__ = 'goal_closure'
+    __table_args__ = (
+        Index('ix_goal_closure_descendant_id', 'descendant_id', 'depth'),
+    )
+
+    ancestor_id = Column(String, ForeignKey('goals.id'), primary_key=True)
+    descendant_id = Column(String, ForeignKey('goals.id'), primary_key=True)
+    depth = Column(Integer)
+
+
 class Skill(Base):
     __tablename__ = 'skills'
     id = Column(String, primary_key=True)
@@ -74,6 +132,9 @@ class Habit(Base):
 
 class HabitLog(Base):
     __tablename__ = 'habit_logs'
+    __table_args__ = (
+        Index('ix_habit_logs_log_date', 'log_date'),
+    )
 
     habit_id = Column(String, ForeignKey('habits.id'), primary_key=True)
     log_date = Column(Date, primary_key=True)
@@ -82,8 +143,33 @@ class HabitLog(Base):
     habit = relationship("Habit")
 
 
+class HabitRollup(Base):
+    """Per-period aggregate of a habit's logs, kept in step with habit_logs."""
+    __tablename__ = 'habit_rollups'
+
+    habit_id = Column(String, ForeignKey('habits.id'), primary_key=True)
+    period_type = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    period_end = Column(Date)
+    total = Column(Float)
+    log_count = Column(Integer)
+    max_value = Column(Float)
+
+    @validates('period_type')
+    def validate_period_type(self, key, value):
+        assert value in ("WEEK", "MONTH", "TARGET"), "HabitRollup period_type must be WEEK, MONTH or TARGET"
+        return value
+
+
 class Task(Base):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        Index('ix_tasks_is_completed_due_date', 'is_completed', 'due_date'),
+        Index('ix_tasks_due_date', 'due_date'),
+        Index('ix_tasks_goal_id', 'goal_id'),
+        Index('ix_tasks_habit_id_due_date', 'habit_id', 'due_date'),
+        Index('ux_tasks_recurrence_key', 'recurrence_key', unique=True),
+    )
     id = Column(String, primary_key=True)
     title = Column(String)
     description = Column(String)
@@ -93,6 +179,7 @@ class Task(Base):
     habit_id = Column(String, ForeignKey('habits.id'))
     xp = Column(Integer)
     due_date = Column(Date)
+    recurrence_key = Column(String)  # "<habit_id>:<due date>" for tasks generated from a habit's period
 
 
 class Account(Base):
@@ -103,10 +190,20 @@ class Account(Base):
     type = Column(String)
 
 
+class BalanceCheckpoint(Base):
+    """Balance of an account at the end of `checkpoint_date`."""
+    __tablename__ = 'balance_checkpoints'
+
+    account_id = Column(String, ForeignKey('accounts.id'), primary_key=True)
+    checkpoint_date = Column(Date, primary_key=True)
+    balance = Column(Float)
+
+
 transaction_tag_table = Table(
     'transaction_tags', Base.metadata,
     Column('transaction_id', String, ForeignKey('transactions.id'), primary_key=True),
-    Column('tag_name', String, ForeignKey('tags.name'), primary_key=True)
+    Column('tag_name', String, ForeignKey('tags.name'), primary_key=True),
+    Index('ix_transaction_tags_tag_name', 'tag_name', 'transaction_id'),
 )
 
 class Tag(Base):
@@ -117,45 +214,362 @@ class Tag(Base):
 
 class Transaction(Base):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        Index('ix_transactions_account_id_date', 'account_id', 'date'),
+        Index('ix_transactions_date_id', 'date', 'id'),
+        Index('ux_transactions_import_hash', 'import_hash', unique=True),
+    )
     id = Column(String, primary_key=True)
     account_id = Column(String, ForeignKey('accounts.id'))
     amount = Column(Float)
     date = Column(Date)
     description = Column(String)
+    import_hash = Column(String)  # set for rows loaded by the statement importer
     tags = relationship("Tag", secondary=transaction_tag_table, back_populates="transactions")
+    account = relationship("Account")
+
+
+class Budget(Base):
+    """Monthly spending limit for a tag."""
+    __tablename__ = 'budgets'
+
+    tag_name = Column(String, ForeignKey('tags.name'), primary_key=True)
+    monthly_limit = Column(Float, nullable=False)
+
+
+class SearchDoc(Base):
+    """Stable integer key of a searchable row; its text is indexed under this id in the search_index FTS5 table."""
+    __tablename__ = 'search_docs'
+    __table_args__ = (
+        Index('ux_search_docs_kind_ref_id', 'kind', 'ref_id', unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # transaction, task, goal or habit
+    ref_id = Column(String, nullable=False)
+
+
+class SnapshotChange(Base):
+    """A monthly partition of an exported table written since its last Parquet export; filled by triggers."""
+    __tablename__ = 'snapshot_changes'
+
+    table_name = Column(String, primary_key=True)
+    partition_key = Column(String, primary_key=True)
+
 
+def setup_database(db_url='sqlite:///database.db', engine: Engine | None = None):
+    from src.database.migrations import upgrade_database
 
-def setup_database(db_url='sqlite:///database.db'):
-    engine = create_engine(db_url)
+    engine = engine or create_engine(db_url)
     try:
         Base.metadata.create_all(engine)
+        upgrade_database(engine)
         print("Database setup successfully")
     except SQLAlchemyError as e:
         print(f"Error setting up database: {e}")
 
 
-def get_session(db_url='sqlite:///database.db'):
-    # Extract path from db_url (works for sqlite file URL)
-    if db_url.startswith("sqlite:///"):
-        db_path = db_url.replace("sqlite:///", "")
-    else:
-        db_path = None  # For other DB types you can adjust logic
-
-    engine = create_engine(db_url)
-
-    # If SQLite file does NOT exist, create tables
-    if db_path and not os.path.exists(db_path):
-        setup_database(db_url)
-
-    Session = sessionmaker(bind=engine)
-    return Session()
+# Applied to every new SQLite connection. WAL lets readers proceed while a
+# writer commits; NORMAL sync is durable across app crashes in WAL mode.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative means KiB
+    "busy_timeout": 5000,  # ms
+}
+
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 10
+
+_engines: dict[str, Engine] = {}
+_scoped_sessions: dict[str, scoped_session] = {}
+_engines_lock = threading.Lock()
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record, pragmas: dict | None = None):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in (pragmas or SQLITE_PRAGMAS).items():
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
+
+
+def get_engine(
+        db_url='sqlite:///database.db',
+        pool_size: int = POOL_SIZE,
+        max_overflow: int = POOL_MAX_OVERFLOW,
+        pragmas: dict | None = None,
+) -> Engine:
+    """
+    Return the shared engine for `db_url`, creating and initializing it on first use.
+
+    Engines are cached per URL so every session on the same database shares
+    one connection pool, and the schema check only runs once per process.
+    The pool and pragma arguments only apply when the engine is created.
+    """
+    engine = _engines.get(db_url)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(db_url)
+        if engine is not None:
+            return engine
+
+        # Extract path from db_url (works for sqlite file URL)
+        if db_url.startswith("sqlite:///"):
+            db_path = db_url.replace("sqlite:///", "")
+        else:
+            db_path = None  # For other DB types you can adjust logic
+
+        if db_path:
+            engine = create_engine(
+                db_url,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                connect_args={"check_same_thread": False},
+            )
+            event.listen(engine, "connect", functools.partial(_apply_sqlite_pragmas, pragmas=pragmas))
+        else:
+            engine = create_engine(db_url)
+        # Per-statement timings for the diagnostics page
+        instrument_engine(engine)
+
+        # If SQLite file does NOT exist, create tables; otherwise bring its schema up to date
+        if db_path and not os.path.exists(db_path):
+            setup_database(db_url, engine)
+        else:
+            from src.database.migrations import upgrade_database
+            upgrade_database(engine)
+
+        _engines[db_url] = engine
+        return engine
+
+
+def dispose_engine(db_url: str):
+    """
+    Forget the cached engine and session registry of `db_url` and close its pooled connections.
+
+    Sessions still open in other threads keep their connection until they
+    are closed; a later get_engine call opens the database again.
+    """
+    with _engines_lock:
+        engine = _engines.pop(db_url, None)
+        registry = _scoped_sessions.pop(db_url, None)
+    if registry is not None:
+        registry.remove()
+    if engine is not None:
+        discard_query_cache(engine)
+        engine.dispose()
+        logger.info("Closed engine for %s", db_url)
+
+
+def get_scoped_session(db_url='sqlite:///database.db') -> scoped_session:
+    """
+    Return the thread-local session registry for `db_url`.
+
+    Each Streamlit script thread gets its own Session (and connection) from
+    the registry instead of sharing a single Session across threads.
+    """
+    registry = _scoped_sessions.get(db_url)
+    if registry is None:
+        engine = get_engine(db_url)
+        with _engines_lock:
+            registry = _scoped_sessions.setdefault(db_url, scoped_session(sessionmaker(bind=engine)))
+    return registry
+
+
+def remove_thread_sessions():
+    """
+    Close the calling thread's session on every database and return the connections to the pool.
+
+    Call it when a unit of work such as a page run ends, so the thread does
+    not keep a connection (and its read transaction) checked out while idle.
+    """
+    with _engines_lock:
+        registries = list(_scoped_sessions.values())
+    for registry in registries:
+        registry.remove()
+
+
+def get_session(db_url='sqlite:///database.db') -> Session:
+    return get_scoped_session(db_url)()
+
+
+def habit_logs_query(
+        habit_id: str,
+        start: date | None = None,
+        end: date | None = None,
+        limit: int | None = None,
+):
+    """SELECT for a habit's logs, most recent first; shared by DbOps and AsyncDbOps."""
+    stmt = select(HabitLog).where(HabitLog.habit_id == habit_id).order_by(HabitLog.log_date.desc())
+    if start is not None:
+        stmt = stmt.where(HabitLog.log_date >= start)
+    if end is not None:
+        stmt = stmt.where(HabitLog.log_date <= end)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def transactions_page_query(
+        limit: int,
+        after: tuple[date, str] | None = None,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        account_ids: Iterable[str] | None = None,
+):
+    """SELECT for one keyset page of transactions; shared by DbOps and AsyncDbOps."""
+    stmt = (
+        select(Transaction)
+        .options(joinedload(Transaction.account), selectinload(Transaction.tags))
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(Transaction.date, Transaction.id) < tuple_(*after))
+    if start_date is not None:
+        stmt = stmt.where(Transaction.date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(Transaction.date <= end_date)
+    if account_ids is not None:
+        stmt = stmt.where(Transaction.account_id.in_(list(account_ids)))
+    return stmt
+
+
+@dataclass
+class _UnitOfWork:
+    """State of an open DbOps.batch() block."""
+    refresh: bool
+    objects: list = field(default_factory=list)  # created objects to refresh after the commit
+    after_commit: list[Callable[[], None]] = field(default_factory=list)
+
+
+# Habit data versions of each database URL, see DbOps.habit_data_version
+_habit_versions: dict[str, dict[str, int]] = {}
+# Called with the ids of habits whose logs were written through any DbOps
+_habit_logs_listeners: list[Callable[[set[str]], None]] = []
+
+
+def add_habit_logs_listener(listener: Callable[[set[str]], None]):
+    """
+    Register `listener` for habit log writes through every DbOps, including ones created later.
+
+    Unlike DbOps.add_habit_logs_listener this opens no database, so modules
+    can register at import time.
+    """
+    if listener not in _habit_logs_listeners:
+        _habit_logs_listeners.append(listener)
 
 
 class DbOps:
     def __init__(self, db_name="database.db"):
 
         db_url = f'sqlite:///{db_folder}/{db_name}'
-        self.db = get_session(db_url)
+        # Proxies every call to the calling thread's own Session
+        self.db = get_scoped_session(db_url)
+        # Shared, version-stamped snapshots of the small lookup tables
+        self.query_cache = get_query_cache(get_engine(db_url))
+
+        self.db_url = db_url
+        # Bumped whenever a habit's logs change, so derived data (charts,
+        # summaries) can be cached per (database, habit, version). Kept per
+        # database URL so a tenant closed and reopened by the router does not
+        # start again at versions that cached entries already use.
+        with _engines_lock:
+            self._habit_versions = _habit_versions.setdefault(db_url, {})
+        self._habit_log_listeners: list[Callable[[set[str]], None]] = []
+        # Open batch() of the calling thread, if any
+        self._local = threading.local()
+
+    def habit_data_version(self, habit_id: str) -> int:
+        return self._habit_versions.get(habit_id, 0)
+
+    def add_habit_logs_listener(self, listener: Callable[[set[str]], None]):
+        """Register `listener` to be called with the ids of habits whose logs were written."""
+        if listener not in self._habit_log_listeners:
+            self._habit_log_listeners.append(listener)
+
+    def remove_session(self):
+        """Close the calling thread's session and return its connection to the pool."""
+        self.db.remove()
+
+    def cache_stats(self) -> dict[str, float]:
+        """Hit and miss counts of the query result cache."""
+        return self.query_cache.stats()
+
+    @property
+    def _unit_of_work(self) -> _UnitOfWork | None:
+        return getattr(self._local, "unit_of_work", None)
+
+    @contextmanager
+    def batch(self, refresh: bool = True) -> Iterator["DbOps"]:
+        """
+        Group write calls into one transaction that is committed once, on exit.
+
+        Inside the block, write methods neither commit nor refresh. New
+        objects already carry their client-generated ids and stay pending
+        until the session flushes them, in bulk, before the next query or at
+        the commit. Reads inside the block therefore see the block's own
+        writes. A clean exit commits everything with a single fsync; an
+        exception rolls all of it back. Nested batch() blocks join the
+        outermost one. Batches are per thread, like the sessions they use.
+
+        Example:
+            with db_ops.batch(refresh=False):
+                for name in names:
+                    db_ops.add_task(name, "", 10, due)
+
+        Args:
+            refresh: Reload the created objects after the commit, as unbatched
+                writes do. With False they keep the values they were created
+                with, and the commit issues no SELECTs.
+        """
+        if self._unit_of_work is not None:
+            yield self
+            return
+
+        unit_of_work = self._local.unit_of_work = _UnitOfWork(refresh)
+        session = self.db()
+        try:
+            yield self
+            expire_on_commit = session.expire_on_commit
+            session.expire_on_commit = refresh
+            try:
+                session.commit()
+            finally:
+                session.expire_on_commit = expire_on_commit
+        except BaseException:
+            session.rollback()
+            raise
+        finally:
+            self._local.unit_of_work = None
+
+        if refresh:
+            for obj in unit_of_work.objects:
+                session.refresh(obj)
+        for callback in unit_of_work.after_commit:
+            callback()
+        logger.info("Committed a batch of %s objects", len(unit_of_work.objects))
+
+    def _commit(self, *objects):
+        """Commit and refresh `objects`; inside batch() leave both to the end of the batch."""
+        unit_of_work = self._unit_of_work
+        if unit_of_work is None:
+            self.db.commit()
+            for obj in objects:
+                self.db.refresh(obj)
+            return
+        unit_of_work.objects.extend(objects)
+
+    def _after_commit(self, callback: Callable[[], None]):
+        """Run `callback` once the current write is committed, i.e. at the end of an open batch()."""
+        unit_of_work = self._unit_of_work
+        if unit_of_work is None:
+            callback()
+        else:
+            unit_of_work.after_commit.append(callback)
 
     def create_goal(
             self,
@@ -173,15 +587,38 @@ class DbOps:
             due_date=due_date,
         )
 
+        from src.database.goals import add_goal_to_closure
+
         self.db.add(goal)
-        self.db.commit()
-        self.db.refresh(goal)
-        logger.info(f"Added goal: {goal.name} to the db")
+        self.db.flush()
+        add_goal_to_closure(self.db, goal.id, goal.parent_id)
+        self._commit(goal)
+        logger.info("Added goal: %s to the db", goal.name)
 
         return goal
 
     def get_all_goals(self) -> Sequence[Goal]:
-        return self.db.execute(select(Goal)).scalars().all()
+        return self.query_cache.get_or_load(
+            "get_all_goals", ("goals",), lambda session: session.execute(select(Goal)).scalars().all()
+        )
+
+    def get_subtree(self, goal_id: str) -> Sequence[Goal]:
+        """Retrieve a goal and all of its descendants, shallowest first."""
+        from src.database.goals import get_subtree
+
+        return get_subtree(self.db, goal_id)
+
+    def get_ancestors(self, goal_id: str) -> Sequence[Goal]:
+        """Retrieve the ancestors of a goal, root first, excluding the goal itself."""
+        from src.database.goals import get_ancestors
+
+        return get_ancestors(self.db, goal_id)
+
+    def goal_progress(self, goal_id: str | None = None) -> dict:
+        """Progress of every goal in `goal_id`'s subtree (or of all goals), keyed by goal id."""
+        from src.database.goals import goal_progress
+
+        return goal_progress(self.db, goal_id)
 
     def create_habit(
             self,
@@ -205,18 +642,18 @@ class DbOps:
         )
 
         self.db.add(habit)
-        self.db.commit()
-        self.db.refresh(habit)
+        self._commit(habit)
 
-        logger.info(f"Added Habit {habit.name} to the db")
+        logger.info("Added Habit %s to the db", habit.name)
 
         return habit
 
     def list_all_habits(self) -> Sequence[Habit]:
-        return self.db.execute(select(Habit)).scalars().all()
+        return self.query_cache.get_or_load(
+            "list_all_habits", ("habits",), lambda session: session.execute(select(Habit)).scalars().all()
+        )
 
     def add_habit_logs(
-
             self,
             log_date: date,
             habit_value_map: dict[str, float]
@@ -229,70 +666,172 @@ class DbOps:
             habit_value_map: Dictionary mapping habit_id to the logged value.
 
         Returns:
-            List of HabitLog instances added.
+            List of HabitLog instances added or updated.
         """
-        updated_logs = []
+        return self.upsert_habit_logs({log_date: habit_value_map})
 
-        for habit_id, value in habit_value_map.items():
-            stmt = select(HabitLog).where(
-                HabitLog.habit_id == habit_id,
-                HabitLog.log_date == log_date
-            )
-            existing_log = self.db.execute(stmt).scalar_one_or_none()
+    def upsert_habit_logs(
+            self,
+            logs_by_date: dict[date, dict[str, float]]
+    ) -> list[HabitLog]:
+        """
+        Insert or update habit logs for one or more dates in a single statement.
+
+        Existing (habit_id, log_date) rows are overwritten with the new value.
+        The resulting rows are read back through RETURNING, so no per-log
+        SELECT or refresh is issued.
+
+        Args:
+            logs_by_date: Dictionary mapping log_date to a habit_id -> value map.
+
+        Returns:
+            List of HabitLog instances reflecting the stored rows.
+        """
+        rows = [
+            {"habit_id": habit_id, "log_date": log_date, "value": value}
+            for log_date, habit_value_map in logs_by_date.items()
+            for habit_id, value in habit_value_map.items()
+        ]
+        if not rows:
+            return []
+
+        from src.database.rollups import get_previous_values, apply_habit_log_changes
+
+        stored_rows = []
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            previous_values = get_previous_values(self.db, batch)
+
+            stmt = sqlite_insert(HabitLog).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[HabitLog.habit_id, HabitLog.log_date],
+                set_={"value": stmt.excluded.value},
+            ).returning(HabitLog.habit_id, HabitLog.log_date, HabitLog.value)
+            stored_rows.extend(self.db.execute(stmt).mappings().all())
+
+            # Rollups move in the same transaction as the logs they summarize
+            apply_habit_log_changes(self.db, batch, previous_values)
+
+        self._commit()
+
+        # Attach the returned rows to the session without another round trip.
+        logs = []
+        for row in stored_rows:
+            log = HabitLog(**row)
+            make_transient_to_detached(log)
+            logs.append(self.db.merge(log, load=False))
+
+        touched = {row["habit_id"] for row in rows}
+        # Only once committed, so nothing derived from the old data is cached under the new version
+        self._after_commit(lambda: self._bump_habit_versions(touched))
+
+        logger.info("Upserted %s habit logs across %s date(s)", len(logs), len(logs_by_date))
+
+        return logs
 
-            if existing_log:
-                existing_log.value = value
-                logger.info(f"Updated HabitLog for habit_id={habit_id}, date={log_date}")
-                updated_logs.append(existing_log)
-            else:
-                new_log = HabitLog(
-                    habit_id=habit_id,
-                    log_date=log_date,
-                    value=value
-                )
-                self.db.add(new_log)
-                updated_logs.append(new_log)
-                logger.info(f"Created HabitLog for habit_id={habit_id}, date={log_date}")
+    def _bump_habit_versions(self, habit_ids: set[str]):
+        for habit_id in habit_ids:
+            self._habit_versions[habit_id] = self._habit_versions.get(habit_id, 0) + 1
+        for listener in self._habit_log_listeners + _habit_logs_listeners:
+            listener(habit_ids)
 
-        self.db.commit()
+    def get_habit_rollups(
+            self,
+            habit_id: str,
+            period_type: str = "MONTH"
+    ) -> Sequence[HabitRollup]:
+        """
+        Retrieve the per-period rollups of a habit, oldest period first.
 
-        for log in updated_logs:
-            self.db.refresh(log)
+        Args:
+            habit_id: The ID of the habit.
+            period_type: WEEK, MONTH or TARGET (the habit's own target period).
 
-        logger.info(f"Processed {len(updated_logs)} habit logs for date {log_date}")
+        Returns:
+            A list of HabitRollup rows, one per period that has logs.
+        """
+        return self.db.execute(
+            select(HabitRollup)
+            .where(HabitRollup.habit_id == habit_id, HabitRollup.period_type == period_type)
+            .order_by(HabitRollup.period_start)
+        ).scalars().all()
+
+    def rebuild_habit_rollups(self):
+        """Regenerate every habit rollup from the raw habit logs."""
+        from src.database.rollups import rebuild_habit_rollups
 
-        return updated_logs
+        rebuild_habit_rollups(self.db.connection())
+        self._commit()
 
     def get_habit_logs_for_day(self, target_date: date) -> Sequence[HabitLog]:
         """Retrieve all HabitLog entries for a given date."""
         logs = self.db.execute(
             select(HabitLog).where(HabitLog.log_date == target_date)
         ).scalars().all()
-        logger.info(f"Retrieved {len(logs)} habit logs for date {target_date}")
+        logger.debug("Retrieved %s habit logs for date %s", len(logs), target_date)
         return logs
 
     def get_habit_logs_by_habit(
             self,
-            habit_id: str
+            habit_id: str,
+            start: date | None = None,
+            end: date | None = None,
+            limit: int | None = None,
     ) -> list[HabitLog]:
         """
-        Retrieve all HabitLog entries for a specific habit, ordered by date descending.
+        Retrieve HabitLog entries for a specific habit, ordered by date descending.
 
         Args:
             habit_id: The ID of the habit.
+            start: Only include logs on or after this date.
+            end: Only include logs on or before this date.
+            limit: Return at most this many of the most recent logs.
 
         Returns:
             A list of HabitLog entries with the most recent log first.
         """
-        logs = self.db.execute(
-            select(HabitLog)
-            .where(HabitLog.habit_id == habit_id)
-            .order_by(HabitLog.log_date.desc())
-        ).scalars().all()
+        logs = self.db.execute(habit_logs_query(habit_id, start, end, limit)).scalars().all()
 
-        logger.info(f"Retrieved {len(logs)} habit logs for habit_id {habit_id}")
+        logger.debug("Retrieved %s habit logs for habit_id %s", len(logs), habit_id)
         return logs
 
+    def stream_habit_logs(
+            self,
+            habit_id: str,
+            start: date | None = None,
+            end: date | None = None,
+            chunk_size: int = HABIT_LOG_CHUNK_SIZE,
+    ) -> Iterator[Sequence[Row]]:
+        """
+        Yield a habit's (log_date, value) rows oldest first, `chunk_size` rows at a time.
+
+        Rows are fetched from the cursor as the caller consumes the chunks and
+        no HabitLog instances are built, so memory stays bounded by one chunk.
+        The calling thread's session is busy until the iterator is exhausted.
+        """
+        stmt = (
+            select(HabitLog.log_date, HabitLog.value)
+            .where(HabitLog.habit_id == habit_id)
+            .order_by(HabitLog.log_date)
+            .execution_options(yield_per=chunk_size)
+        )
+        if start is not None:
+            stmt = stmt.where(HabitLog.log_date >= start)
+        if end is not None:
+            stmt = stmt.where(HabitLog.log_date <= end)
+        yield from self.db.execute(stmt).partitions()
+
+    def habit_log_arrays(
+            self,
+            habit_id: str,
+            start: date | None = None,
+            end: date | None = None,
+    ) -> tuple["np.ndarray", "np.ndarray"]:
+        """A habit's logs as (datetime64[D] dates, float64 values) arrays, oldest first; NULL values are NaN."""
+        from src.database.habit_analytics import load_habit_series
+
+        return load_habit_series(self, habit_id, start, end)
+
     def create_xp_progression(
             self,
             xp_type: str,
@@ -308,29 +847,50 @@ class DbOps:
             rate=rate
         )
         self.db.add(xp_prog)
-        self.db.commit()
-        self.db.refresh(xp_prog)
-        logger.info(f"Added new XPProgression with type {xp_type}")
+        self._commit(xp_prog)
+        logger.info("Added new XPProgression with type %s", xp_type)
         return xp_prog
 
     def list_xp_progressions(self) -> Sequence[XPProgression]:
-        return self.db.execute(select(XPProgression)).scalars().all()
+        return self.query_cache.get_or_load(
+            "list_xp_progressions", ("xp_progressions",), lambda session: session.execute(select(XPProgression)).scalars().all()
+        )
 
     def update_xp_progression(
             self,
             xp_prog_id: str,
             new_xp: int,
-            new_level: int
+            new_level: int | None = None
     ):
+        """Set a progression's total XP; the level is derived from the XP curve."""
+        from src.database.xp import level_for_xp
+
         xp_prog = self.db.get(XPProgression, xp_prog_id)
         if xp_prog is None:
-            logger.error(f"XPProgression with id {xp_prog_id} not found.")
+            logger.error("XPProgression with id %s not found.", xp_prog_id)
             return Exception("Invalid XP Progression")
 
+        level = level_for_xp(xp_prog.type, xp_prog.base, xp_prog.rate, new_xp)
+        if new_level is not None and new_level != level:
+            logger.warning("Ignoring level %s for XPProgression %s; %s XP is level %s", new_level, xp_prog_id, new_xp, level)
+
         xp_prog.xp = new_xp
-        xp_prog.level = new_level
-        self.db.commit()
-        logger.info(f"Updated XPProgression {xp_prog_id}: XP={new_xp}, Level={new_level}")
+        xp_prog.level = level
+        self._commit()
+        logger.info("Updated XPProgression %s: XP=%s, Level=%s", xp_prog_id, new_xp, level)
+
+    def award_xp(self, xp_prog_id: str, amount: int) -> tuple[int, int]:
+        """Atomically add XP to a progression and return its new (xp, level)."""
+        from src.database.xp import award_xp
+
+        results = award_xp(self.db, {xp_prog_id: amount})
+        if xp_prog_id not in results:
+            if self._unit_of_work is None:
+                self.db.rollback()  # an open batch() rolls back as the error propagates
+            raise ValueError(f"XPProgression {xp_prog_id} not found.")
+        self._commit()
+        logger.info("Awarded %s XP to XPProgression %s", amount, xp_prog_id)
+        return results[xp_prog_id]
 
     def add_grind(
             self,
@@ -341,24 +901,27 @@ class DbOps:
             base: float,
             rate: float
     ) -> Grind:
-        xp_prog = self.create_xp_progression(xp_type, base, rate)
-
-        grind = Grind(
-            id=str(uuid4()),
-            name=name,
-            skill_id=skill.id,
-            description=description,
-            xp_progression_id=xp_prog.id
-        )
-        self.db.add(grind)
-        self.db.commit()
-        self.db.refresh(grind)
-        logger.info(f"Added Grind {name}")
+        # The progression and its grind are committed together
+        with self.batch():
+            xp_prog = self.create_xp_progression(xp_type, base, rate)
+
+            grind = Grind(
+                id=str(uuid4()),
+                name=name,
+                skill_id=skill.id,
+                description=description,
+                xp_progression_id=xp_prog.id
+            )
+            self.db.add(grind)
+            self._commit(grind)
+        logger.info("Added Grind %s", name)
 
         return grind
 
     def list_grinds(self) -> Sequence[Grind]:
-        return self.db.execute(select(Grind)).scalars().all()
+        return self.query_cache.get_or_load(
+            "list_grinds", ("grinds",), lambda session: session.execute(select(Grind)).scalars().all()
+        )
 
     def add_task(
             self,
@@ -383,9 +946,8 @@ class DbOps:
             is_completed=is_completed
         )
         self.db.add(task)
-        self.db.commit()
-        self.db.refresh(task)
-        logger.info(f"Added Task {title}")
+        self._commit(task)
+        logger.info("Added Task %s", title)
 
         return task
 
@@ -393,15 +955,73 @@ class DbOps:
         task = self.db.get(Task, task_id)
         if not task:
             raise ValueError(f"Task {task_id} not found.")
-        task.is_completed = True
-        self.db.commit()
-        logger.info(f"Task {task_id} marked as completed")
+        self.complete_tasks([task_id])
+        logger.info("Task %s marked as completed", task_id)
         self.db.refresh(task)
         return task
 
+    def complete_tasks(self, task_ids: Iterable[str]) -> list[str]:
+        """
+        Mark many tasks completed in one transaction, awarding their XP.
+
+        XP of the newly completed tasks is summed per grind progression and
+        applied once per progression. Tasks that were already completed award
+        nothing.
+
+        Args:
+            task_ids: IDs of the tasks to complete.
+
+        Returns:
+            IDs of the tasks that were newly completed.
+        """
+        from src.database.xp import complete_tasks
+
+        completed = complete_tasks(self.db, task_ids)
+        self._commit()
+        return completed
+
     def list_tasks(self) -> Sequence[Task]:
         return self.db.execute(select(Task)).scalars().all()
 
+    def list_overdue_tasks(self, today: date | None = None, limit: int | None = None) -> list[Task]:
+        """Open tasks due before today, oldest first."""
+        from src.database.scheduler import overdue_tasks
+
+        return overdue_tasks(self.db, today or date.today(), limit)
+
+    def list_tasks_due_today(self, today: date | None = None) -> list[Task]:
+        from src.database.scheduler import tasks_due_on
+
+        return tasks_due_on(self.db, today or date.today())
+
+    def list_upcoming_tasks(self, days: int = 7, today: date | None = None, limit: int | None = None) -> list[Task]:
+        """Open tasks due in the next `days` days, soonest first."""
+        from src.database.scheduler import upcoming_tasks
+
+        return upcoming_tasks(self.db, today or date.today(), days, limit)
+
+    def task_agenda(self, days: int = 7, today: date | None = None, limit: int | None = None) -> "TaskAgenda":
+        """Overdue, due today and upcoming open tasks; see scheduler.task_agenda."""
+        from src.database.scheduler import task_agenda
+
+        return task_agenda(self.db, today or date.today(), days, limit)
+
+    def generate_recurring_tasks(self, days: int = 28, start: date | None = None, xp: int = 0) -> int:
+        """
+        Create each habit's periodic tasks over the next `days` days in one batched insert.
+
+        Idempotent: tasks that already exist for a habit and due date are
+        skipped, so it is safe to run on every app start.
+
+        Returns:
+            The number of tasks created.
+        """
+        from src.database.scheduler import generate_recurring_tasks
+
+        created = generate_recurring_tasks(self.db, start or date.today(), days, xp)
+        self._commit()
+        return created
+
     def add_account(
             self,
             name: str,
@@ -416,15 +1036,16 @@ class DbOps:
         )
 
         self.db.add(account)
-        self.db.commit()
-        self.db.refresh(account)
+        self._commit(account)
 
-        logger.info(f"Added Account {name}")
+        logger.info("Added Account %s", name)
 
         return account
 
     def list_accounts(self) -> Sequence[Account]:
-        return self.db.execute(select(Account)).scalars().all()
+        return self.query_cache.get_or_load(
+            "list_accounts", ("accounts",), lambda session: session.execute(select(Account)).scalars().all()
+        )
 
     def create_transaction(
             self,
@@ -442,8 +1063,14 @@ class DbOps:
             description=description
         )
 
+        from src.database.ledger import apply_balance_delta
+
+        # Adjust the stored balance (and later checkpoints) in SQL, not from a possibly stale copy
+        apply_balance_delta(self.db, account.id, txn_date, -amount)
+        if account in self.db:
+            self.db.expire(account, ['balance'])
+
         self.db.add(transaction)  # Add first to ensure it's attached to session
-        account.balance = account.balance - amount
         self.db.flush()  # Ensure transaction gets an ID and is tracked
 
         # Handle tags
@@ -455,23 +1082,170 @@ class DbOps:
                     self.db.add(tag)
                 transaction.tags.append(tag)
 
-        self.db.commit()
-        self.db.refresh(transaction)
+        self._commit(transaction)
 
-        logger.info(f"Created transaction {transaction.id} with tags: {tag_names}")
-        logger.info(f"Account balance: {account.balance}")
+        logger.info("Created transaction %s with tags: %s", transaction.id, tag_names)
+        if logger.isEnabledFor(logging.DEBUG):
+            # Reading the expired balance costs a SELECT, so only do it when it will be logged
+            logger.debug("Account balance: %s", account.balance)
         return transaction
 
     def list_transactions(self) -> Sequence[Transaction]:
         return self.db.execute(select(Transaction)).scalars().all()
 
+    def list_transactions_page(
+            self,
+            limit: int = 50,
+            after: tuple[date, str] | None = None,
+            start_date: date | None = None,
+            end_date: date | None = None,
+            account_ids: Iterable[str] | None = None,
+    ) -> Sequence[Transaction]:
+        """
+        Retrieve one page of transactions, newest first, with account and tags loaded.
+
+        Pages are keyed on (date, id) so fetching a later page costs the same as
+        the first one. The account is joined in and tags are loaded with one
+        extra SELECT ... IN query for the whole page.
+
+        Args:
+            limit: Maximum number of transactions to return.
+            after: (date, id) of the last transaction of the previous page.
+            start_date: Only include transactions on or after this date.
+            end_date: Only include transactions on or before this date.
+            account_ids: Only include transactions from these accounts.
+
+        Returns:
+            A list of at most `limit` transactions.
+        """
+        stmt = transactions_page_query(limit, after, start_date, end_date, account_ids)
+        return self.db.execute(stmt).scalars().all()
+
+    def balance_as_of(self, account_id: str, as_of: date) -> float:
+        """Balance of an account at the end of `as_of`."""
+        from src.database.ledger import balance_as_of
+
+        return balance_as_of(self.db, account_id, as_of)
+
+    def balance_series(self, account_id: str, start: date, end: date) -> list[tuple[date, float]]:
+        """End-of-day balances of an account for every day from `start` to `end`."""
+        from src.database.ledger import balance_series
+
+        return balance_series(self.db, account_id, start, end)
+
+    def rebuild_balance_checkpoints(self):
+        """Regenerate the monthly balance checkpoints of every account."""
+        from src.database.ledger import rebuild_balance_checkpoints
+
+        rebuild_balance_checkpoints(self.db.connection())
+        self._commit()
+
+    def export_snapshots(self, export_dir: str | Path | None = None, full: bool = False) -> dict[str, int]:
+        """Write habit logs, transactions and tasks changed since the last export to partitioned Parquet."""
+        from src.database.snapshots import DEFAULT_EXPORT_DIR, export_snapshots
+
+        return export_snapshots(self, export_dir or DEFAULT_EXPORT_DIR, full)
+
+    def set_budget(self, tag_name: str, monthly_limit: float) -> Budget:
+        """Create or replace the monthly spending limit of a tag, creating the tag if needed."""
+        self.db.execute(sqlite_insert(Tag).values(name=tag_name).on_conflict_do_nothing())
+        self.db.execute(
+            sqlite_insert(Budget)
+            .values(tag_name=tag_name, monthly_limit=monthly_limit)
+            .on_conflict_do_update(index_elements=[Budget.tag_name], set_={"monthly_limit": monthly_limit})
+        )
+        self._commit()
+        logger.info("Set budget of tag %s to %s", tag_name, monthly_limit)
+        return self.db.get(Budget, tag_name, populate_existing=True)
+
+    def list_budgets(self) -> Sequence[Budget]:
+        return self.query_cache.get_or_load(
+            "list_budgets", ("budgets",), lambda session: session.execute(select(Budget)).scalars().all()
+        )
+
+    def spending_by_month(
+            self,
+            start: date,
+            end: date,
+            group_by: str | None = "tag",
+            account_ids: Iterable[str] | None = None,
+            window: int = 3,
+    ) -> "SpendingBreakdown":
+        """Monthly spending per tag, per account or in total, aggregated in SQL; see spending.spending_by_month."""
+        from src.database.spending import spending_by_month
+
+        return spending_by_month(self.db, start, end, group_by, account_ids, window)
+
+    def budget_vs_actual(self, month: date) -> "BudgetReport":
+        """Each budgeted tag's limit against its spending in `month`."""
+        from src.database.spending import budget_vs_actual
+
+        return budget_vs_actual(self.db, month)
+
+    def search(
+            self,
+            query: str,
+            kinds: Iterable[str] | None = None,
+            limit: int = 20,
+            offset: int = 0,
+    ) -> "SearchPage":
+        """Full-text search over transactions, tasks, goals and habits, best match first; see search.search."""
+        from src.database.search import search
+
+        return search(self.db, query, kinds, limit, offset)
+
+    def rebuild_search_index(self):
+        """Regenerate the full-text index from the source tables."""
+        from src.database.search import rebuild_search_index
+
+        rebuild_search_index(self.db.connection())
+        self._commit()
+
     def list_tags(self) -> Sequence[Tag]:
-        return self.db.execute(select(Tag)).scalars().all()
+        return self.query_cache.get_or_load(
+            "list_tags", ("tags",), lambda session: session.execute(select(Tag)).scalars().all()
+        )
+
+
+
 
+PROD_DB_NAME = "prod.db"
 
+_db_ops: DbOps | None = None
+_db_ops_lock = threading.Lock()
 
 
-db_ops = DbOps("prod.db")
+def get_db_ops() -> DbOps:
+    """
+    Return the DbOps of the calling thread's tenant, or the production one when no tenant is set.
+
+    See tenants.set_current_tenant.
+    """
+    from src.database.tenants import current_tenant, get_tenant_router
+
+    tenant_id = current_tenant()
+    if tenant_id is not None:
+        return get_tenant_router().get(tenant_id)
+    return get_prod_db_ops()
+
+
+def get_prod_db_ops() -> DbOps:
+    """Return the shared production DbOps, opening the database on first use."""
+    global _db_ops
+    if _db_ops is None:
+        with _db_ops_lock:
+            if _db_ops is None:
+                _db_ops = DbOps(PROD_DB_NAME)
+    return _db_ops
+
+
+def __getattr__(name: str):
+    # `from src.database.utils import db_ops` keeps working, but importing this
+    # module no longer creates an engine or touches the database file.
+    if name == "db_ops":
+        return get_db_ops()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # db_ops.create_goal(name="t1", description="t1", due_date=date(2025, 5, 30))
 # print(db_ops.get_all_goals())
 #
@@ -483,6 +1257,7 @@ if __name__ == "__main__":
 
     # test
     # db_ops = DbOps(db_url="sqlite:///test.db")
+    db_ops = get_db_ops()
     db_ops.create_goal(name="t1", description="t1", due_date=date(2025, 5, 30))
     print(db_ops.get_all_goals())
 
@@ -490,6 +1265,3 @@ if __name__ == "__main__":
     # db_ops = DbOps()
     # db_ops.create_goal(name="t1", description="t1", due_date=date(2025, 5, 30))
     # print(db_ops.get_all_goals())
-
-
-
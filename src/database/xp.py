@@ -0,0 +1,127 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import math
+from collections import defaultdict
+from typing import Iterable
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from src.database.utils import Grind, Task, XPProgression
+
+# Level curves. Every progression starts at level 1 with 0 XP.
+#   LINEAR:      each level costs `base` XP            -> threshold(L) = base * (L - 1)
+#   EXPONENTIAL: level k costs base * rate ** (k - 1)  -> threshold(L) = base * (rate ** (L - 1) - 1) / (rate - 1)
+# LINEAR curves do not use `rate`; EXPONENTIAL curves need rate > 1 (checked by XPProgression).
+
+
+def xp_for_level(xp_type: str, base: float, rate: float, level: int) -> float:
+    """Total XP needed to reach `level`."""
+    steps = max(level, 1) - 1
+    if xp_type == "LINEAR" or rate == 1:
+        return base * steps
+    return base * (rate ** steps - 1) / (rate - 1)
+
+
+def level_for_xp(xp_type: str, base: float, rate: float, xp: float) -> int:
+    """
+    Level reached with `xp` total XP, solved in closed form.
+
+    Linear curves divide, exponential curves take a logarithm; the result is
+    then nudged by at most one level to absorb floating point error.
+    """
+    if xp <= 0 or base <= 0:
+        return 1
+    if xp_type == "LINEAR" or rate == 1:
+        level = 1 + int(xp // base)
+    else:
+        level = 1 + int(math.floor(math.log1p(xp * (rate - 1) / base) / math.log(rate)))
+        level = max(level, 1)
+
+    if xp_for_level(xp_type, base, rate, level + 1) <= xp:
+        level += 1
+    elif level > 1 and xp_for_level(xp_type, base, rate, level) > xp:
+        level -= 1
+    return level
+
+
+def award_xp(session: Session, xp_totals: dict[str, int]) -> dict[str, tuple[int, int]]:
+    """
+    Add XP to progressions and re-derive their levels inside the caller's transaction.
+
+    The increment is a SQL-side `xp = xp + :amount`, so concurrent awards add
+    up instead of overwriting each other.
+
+    Args:
+        session: Session holding the transaction.
+        xp_totals: XP to add per progression id.
+
+    Returns:
+        New (xp, level) per progression id that exists.
+    """
+    if not xp_totals:
+        return {}
+
+    table = XPProgression.__table__
+    session.execute(
+        update(table)
+        .where(table.c.id == bindparam("b_id"))
+        .values(xp=table.c.xp + bindparam("b_amount")),
+        [{"b_id": prog_id, "b_amount": amount} for prog_id, amount in xp_totals.items()],
+    )
+    increments = session.execute(
+        select(table.c.id, table.c.xp, table.c.type, table.c.base, table.c.rate)
+        .where(table.c.id.in_(list(xp_totals)))
+    ).all()
+
+    results = {
+        prog_id: (xp, level_for_xp(xp_type, base, rate, xp))
+        for prog_id, xp, xp_type, base, rate in increments
+    }
+    if results:
+        session.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(level=bindparam("b_level")),
+            [{"b_id": prog_id, "b_level": level} for prog_id, (_, level) in results.items()],
+        )
+    session.expire_all()
+    return results
+
+
+def complete_tasks(session: Session, task_ids: Iterable[str]) -> list[str]:
+    """
+    Mark tasks completed and award their XP to their grinds' progressions.
+
+    Tasks that were already completed are left alone and award nothing, so
+    repeating a call never double counts. XP is summed per progression and
+    applied with one increment each.
+
+    Returns:
+        Ids of the tasks that this call completed.
+    """
+    task_ids = list(task_ids)
+    if not task_ids:
+        return []
+
+    table = Task.__table__
+    completed = session.execute(
+        update(table)
+        .where(table.c.id.in_(task_ids), (table.c.is_completed.is_(None)) | (table.c.is_completed == False))  # noqa: E712
+        .values(is_completed=True)
+        .returning(table.c.id, table.c.xp, table.c.grind_id)
+    ).all()
+
+    grind_ids = {grind_id for _, _, grind_id in completed if grind_id}
+    progression_of = dict(session.execute(
+        select(Grind.id, Grind.xp_progression_id).where(Grind.id.in_(grind_ids))
+    ).all()) if grind_ids else {}
+
+    xp_totals = defaultdict(int)
+    for _, xp, grind_id in completed:
+        prog_id = progression_of.get(grind_id)
+        if prog_id and xp:
+            xp_totals[prog_id] += xp
+    award_xp(session, xp_totals)
+
+    logger.info("Completed %s tasks, awarding XP to %s progressions", len(completed), len(xp_totals))
+    return [task_id for task_id, _, _ in completed]
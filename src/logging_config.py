@@ -1,38 +1,71 @@
 # logging_config.py
 
+import atexit
 import logging
-import logging.config
+import logging.handlers
+import os
+import queue
 
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-LOG_LEVEL = logging.DEBUG  # You can set this from an env var
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 5))
+
+# Set on the root logger so repeated calls (Streamlit re-runs app.py on every
+# interaction, and the module may be imported as both `logging_config` and
+# `src.logging_config`) never start a second listener.
+_LISTENER_ATTR = "_life_tracker_queue_listener"
+
+
+class _DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues the record unformatted.
+
+    The stock prepare() merges the message with its args on the caller's
+    thread. Here only a traceback is rendered up front, because it refers to
+    live frames; message formatting is left to the listener thread. Log
+    arguments are therefore read later, so don't pass objects that are
+    mutated right after the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            # Drop the traceback so the queue does not keep its frames alive
+            record.exc_info = None
+        return record
 
 
 def setup_logging(log_file='app.log'):
-    logging_config = {
-        'version': 1,
-        'disable_existing_loggers': False,
-        'formatters': {
-            'default': {
-                'format': LOG_FORMAT,
-            },
-        },
-        'handlers': {
-            'console': {
-                'class': 'logging.StreamHandler',
-                'formatter': 'default',
-                'level': LOG_LEVEL,
-            },
-            'file': {
-                'class': 'logging.FileHandler',
-                'formatter': 'default',
-                'filename': log_file,
-                'level': LOG_LEVEL,
-            },
-        },
-        'root': {
-            'handlers': ['console', 'file'],
-            'level': LOG_LEVEL,
-        },
-    }
-
-    logging.config.dictConfig(logging_config)
+    """
+    Route all logging through a queue drained by a background thread.
+
+    Callers only pay for putting the record on the queue (plus rendering a
+    traceback, if any); formatting and the console/file writes happen on the
+    listener thread. The file rotates at
+    LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old files. LOG_LEVEL,
+    LOG_MAX_BYTES and LOG_BACKUP_COUNT can be set from the environment.
+    """
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    if getattr(root, _LISTENER_ATTR, None) is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    console = logging.StreamHandler()
+    console.setFormatter(formatter)
+    file = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True
+    )
+    file.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, console, file, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredFormatQueueHandler(log_queue))
+    setattr(root, _LISTENER_ATTR, listener)
@@ -1,5 +1,9 @@
 import streamlit as st
+from datetime import date, timedelta
 from src.database.utils import db_ops, Account
+from src.database.instrumentation import begin_render
+
+begin_render("accounts")
 
 st.subheader("Accounts")
 
@@ -23,6 +27,17 @@ if accounts:
 else:
     st.write("No accounts found.")
 
+# Balance history, served from the monthly balance checkpoints
+st.write("## Balance History")
+if accounts:
+    history_names = {account.id: account.name for account in accounts}
+    history_account = st.selectbox("Account", options=list(history_names.keys()), format_func=lambda x: history_names[x])
+    history_days = st.slider("Days", min_value=30, max_value=730, value=180)
+    end = date.today()
+    series = db_ops.balance_series(history_account, end - timedelta(days=history_days), end)
+    import pandas as pd  # deferred: only needed once there is a chart to draw
+    st.line_chart(pd.DataFrame(series, columns=["Date", "Balance"]).set_index("Date"))
+
 # Delete an account (optional)
 with st.form("delete_account"):
     st.write("## Delete an account")
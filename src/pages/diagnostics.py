@@ -0,0 +1,74 @@
+import streamlit as st
+from datetime import datetime
+from src.database.utils import db_ops
+from src.database import instrumentation
+from src.database.instrumentation import begin_render, recorder
+
+begin_render("diagnostics")
+
+st.title("🩺 Query Diagnostics")
+
+if not instrumentation.INSTRUMENTATION_ENABLED:
+    st.info("SQL instrumentation is disabled (SQL_INSTRUMENTATION=0).")
+    st.stop()
+
+st.caption(
+    f"Slow query threshold: {instrumentation.SLOW_QUERY_MS:.0f} ms · "
+    f"N+1 threshold: {instrumentation.N_PLUS_ONE_THRESHOLD} repeats per render"
+)
+if st.button("Reset statistics"):
+    recorder.reset()
+
+# Statements by total time spent
+st.write("### Top statements")
+limit = st.slider("Statements to show", min_value=5, max_value=100, value=20)
+statements = recorder.top_statements(limit)
+if statements:
+    st.dataframe(
+        [
+            {
+                "Statement": stats.fingerprint,
+                "Calls": stats.count,
+                "Total ms": round(stats.total_ms, 2),
+                "Mean ms": round(stats.mean_ms, 3),
+                "Max ms": round(stats.max_ms, 2),
+                "Rows written": stats.rows_written,
+            }
+            for stats in statements
+        ],
+        use_container_width=True,
+    )
+else:
+    st.write("No statements recorded yet.")
+
+# Query counts per page render, newest first
+st.write("### Recent page renders")
+renders = [render for render in recorder.recent_renders() if render.query_count]
+if renders:
+    st.dataframe(
+        [
+            {
+                "Page": render.page,
+                "Started": datetime.fromtimestamp(render.started_at).strftime("%H:%M:%S"),
+                "Queries": render.query_count,
+                "Total ms": round(render.total_ms, 2),
+                "Distinct statements": len(render.fingerprints),
+            }
+            for render in renders
+        ],
+        use_container_width=True,
+    )
+else:
+    st.write("No page renders recorded yet.")
+
+st.write("### Possible N+1 patterns")
+flagged = False
+for render in renders:
+    for statement, count in render.n_plus_one():
+        flagged = True
+        st.warning(f"**{render.page}** ran this statement {count} times in one render:\n\n`{statement}`")
+if not flagged:
+    st.success("No statement repeated enough times in a single render to look like N+1.")
+
+st.write("### Query cache")
+st.json(db_ops.cache_stats())
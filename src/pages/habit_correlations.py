@@ -0,0 +1,87 @@
+import streamlit as st
+from datetime import date, timedelta
+from src.database.utils import db_ops
+from src.database.instrumentation import begin_render
+
+begin_render("habit_correlations")
+
+st.set_page_config(page_title="Habit Correlations", layout="wide")
+st.title("🔗 Habit Correlations")
+
+habits = db_ops.list_all_habits()
+if len(habits) < 2:
+    st.warning("Track at least two habits to compare them.")
+    st.stop()
+
+# Controls
+control_cols = st.columns(3)
+start_date = control_cols[0].date_input("From", value=date.today() - timedelta(days=365))
+end_date = control_cols[1].date_input("To", value=date.today())
+max_lag = control_cols[2].slider("Max lag (days)", min_value=0, max_value=14, value=3)
+if start_date > end_date:
+    st.error("'From' must be on or before 'To'.")
+    st.stop()
+
+# Heavy modules are only loaded once there is something to compute
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from src.database.habit_analytics import correlate_habits, load_habit_matrix
+
+# Every habit's logs in one query, pivoted to a date x habit matrix
+matrix = load_habit_matrix(db_ops, start=start_date, end=end_date)
+correlations = correlate_habits(matrix, max_lag)
+names = [habit.name for habit in matrix.habits]
+
+# region Pairwise correlations
+st.subheader("Same-day correlations")
+st.plotly_chart(
+    px.imshow(
+        correlations.at_lag(0), x=names, y=names, zmin=-1, zmax=1,
+        color_continuous_scale="RdBu", aspect="auto", text_auto=".2f",
+    ),
+    use_container_width=True,
+)
+# endregion
+
+# region Lagged effects
+st.subheader("Lagged effects")
+if len(correlations.lags) > 1:
+    lag = st.select_slider("Lag (days)", options=list(correlations.lags[1:]), value=correlations.lags[1])
+    st.caption(f"Row habit on day t vs. column habit on day t + {lag}")
+    st.plotly_chart(
+        px.imshow(
+            correlations.at_lag(lag), x=names, y=names, zmin=-1, zmax=1,
+            color_continuous_scale="RdBu", aspect="auto", text_auto=".2f",
+        ),
+        use_container_width=True,
+    )
+
+    # Strongest effects over all lags >= 1 between different habits
+    lagged = correlations.correlations[1:]
+    lag_idx, first, second = np.nonzero(~np.isnan(lagged) & ~np.eye(len(names), dtype=bool)[None, :, :])
+    strongest = pd.DataFrame({
+        "Habit": np.array(names)[first],
+        "Followed by": np.array(names)[second],
+        "Lag (days)": correlations.lags[1:][lag_idx],
+        "Correlation": lagged[lag_idx, first, second],
+    })
+    strongest = strongest.reindex(strongest["Correlation"].abs().sort_values(ascending=False).index).head(15)
+    st.dataframe(strongest.round(3), use_container_width=True, hide_index=True)
+else:
+    st.write("Increase the max lag to look at next-day effects.")
+# endregion
+
+# region Combined heatmap
+st.subheader("All habits over time")
+st.caption("Weekly totals, scaled per habit to its own maximum")
+weekly = pd.DataFrame(matrix.values, index=pd.to_datetime(matrix.dates), columns=names).resample("W").sum()
+peaks = weekly.max().replace(0, np.nan)
+st.plotly_chart(
+    px.imshow(
+        (weekly / peaks).fillna(0).T, x=weekly.index, y=names, zmin=0, zmax=1,
+        color_continuous_scale="Greens", aspect="auto",
+    ),
+    use_container_width=True,
+)
+# endregion
@@ -1,5 +1,8 @@
 import streamlit as st
 from src.database.utils import db_ops
+from src.database.instrumentation import begin_render
+
+begin_render("habit_create")
 
 st.title("🌀 Create a New Habit")
 
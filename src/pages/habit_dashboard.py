@@ -1,9 +1,9 @@
-import calmap
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from matplotlib import pyplot as plt
 from src.database.utils import db_ops
+from src.database.async_ops import get_async_db_ops, load_page_data
+from src.database.instrumentation import begin_render
+
+begin_render("habit_dashboard")
 
 st.set_page_config(page_title="Habit Dashboard", layout="wide")
 
@@ -30,33 +30,78 @@ st.markdown(f"**Target**: {selected_habit.target_frequency_value} {selected_habi
 # Fetch Habit Logs
 logs = db_ops.get_habit_logs_for_day  # alias
 
-# Gather all logs for this habit
-all_logs = db_ops.get_habit_logs_by_habit(selected_habit.id)
+# Rendered charts are cached per habit, database and data version. Read the
+# version before the data: a write committing in between bumps it, so charts
+# built from the older data are cached under the older version, never the new one.
+data_version = db_ops.habit_data_version(selected_habit.id)
+
+# Gather all logs for this habit as (dates, values) arrays, and its monthly rollups alongside them
+async_db_ops = get_async_db_ops()
+page_data = load_page_data(
+    series=async_db_ops.habit_log_arrays(selected_habit.id),
+    monthly=async_db_ops.get_habit_rollups(selected_habit.id, "MONTH"),
+)
+log_dates, log_values = page_data["series"]
 
-if not all_logs:
+if not len(log_dates):
     st.info("No logs found for this habit.")
     st.stop()
 
+# Heavy analytics and charting modules are only loaded once there is data to
+# show; matplotlib/calmap and plotly.express load only when a chart is rendered
+import pandas as pd
+import plotly.io as pio
+from src.database.habit_analytics import habit_matrix_from_series, score_habits
+from src.render_cache import render_cache
+
 # Convert to DataFrame
-df = pd.DataFrame([
-    {"Date": log.log_date, "Value": log.value}
-    for log in all_logs
-])
-df["Date"] = pd.to_datetime(df["Date"])
+df = pd.DataFrame({"Date": pd.to_datetime(log_dates), "Value": log_values})
 
 # Line Chart
 if not selected_habit.is_binary_habit:
-    fig = px.line(df, x="Date", y="Value", markers=True,
-                  title="Habit Progress Over Time",
-                  labels={"Value": "Logged Value", "Date": "Date"})
-    st.plotly_chart(fig, use_container_width=True)
+    def render_line_chart() -> str:
+        import plotly.express as px
+
+        return px.line(df, x="Date", y="Value", markers=True,
+                       title="Habit Progress Over Time",
+                       labels={"Value": "Logged Value", "Date": "Date"}).to_json()
+
+    fig_json = render_cache.get_or_render((selected_habit.id, db_ops.db_url, data_version, "line"), render_line_chart)
+    st.plotly_chart(pio.from_json(fig_json), use_container_width=True)
 
 # region Summary Stats
 st.subheader("Summary Statistics")
 col1, col2, col3 = st.columns(3)
-col1.metric("Total Logs", len(df))
-col2.metric("Average Value", round(df["Value"].mean(), 2))
+# Totals come from the monthly rollups rather than the raw logs
+monthly = page_data["monthly"]
+total_logs = sum(rollup.log_count for rollup in monthly)
+col1.metric("Total Logs", total_logs)
+col2.metric("Average Value", round(sum(rollup.total for rollup in monthly) / total_logs, 2) if total_logs else 0)
 col3.metric("Most Recent", df["Date"].max().strftime('%Y-%m-%d'))
+
+
+def render_monthly_chart() -> str:
+    import plotly.express as px
+
+    monthly_df = pd.DataFrame({
+        "Month": [rollup.period_start for rollup in monthly],
+        "Total": [rollup.total for rollup in monthly],
+    })
+    return px.bar(monthly_df, x="Month", y="Total", title="Monthly Totals").to_json()
+
+
+fig_json = render_cache.get_or_render((selected_habit.id, db_ops.db_url, data_version, "monthly"), render_monthly_chart)
+st.plotly_chart(pio.from_json(fig_json), use_container_width=True)
+# endregion
+
+# region Target Adherence
+# Scored from the logs loaded above rather than querying them again
+scores = score_habits(habit_matrix_from_series(selected_habit, log_dates, log_values))
+st.subheader("Target Adherence")
+col1, col2, col3 = st.columns(3)
+col1.metric("Current Streak", f"{scores.current_streak[0]} day(s)")
+col2.metric("Longest Streak", f"{scores.longest_streak[0]} day(s)")
+col3.metric("Adherence", f"{scores.adherence[0]:.0%}")
 # endregion
 
 # region Heat Map
@@ -65,20 +110,33 @@ daily_values = df['Value']
 
 st.title("Habit Tracker - GitHub-style Contribution Heatmap")
 
-# Plot the heatmap using calmap
-fig, ax = plt.subplots(figsize=(16, 5))
 
-if selected_habit.is_binary_habit:
-    from matplotlib.colors import LinearSegmentedColormap
-    red_to_green = LinearSegmentedColormap.from_list('SoftRedGreen', ["#c95757", "#57c959"])
-    green_to_red = red_to_green.reversed()
-    cmap = green_to_red if selected_habit.is_negative_habit else red_to_green
-    calmap.yearplot(daily_values, ax=ax, vmin=0, vmax=1, cmap=cmap, linewidth=3, fillcolor='#f0f0f0', linecolor='white')
-else:
-    cmap = "Reds" if selected_habit.is_negative_habit else "Greens"
-    calmap.yearplot(daily_values, ax=ax, cmap=cmap, linewidth=3, fillcolor='#a8a8a8', linecolor='white')
+def render_heatmap() -> bytes:
+    import io
+    import calmap
+    from matplotlib import pyplot as plt
+
+    # Plot the heatmap using calmap
+    fig, ax = plt.subplots(figsize=(16, 5))
+
+    if selected_habit.is_binary_habit:
+        from matplotlib.colors import LinearSegmentedColormap
+        red_to_green = LinearSegmentedColormap.from_list('SoftRedGreen', ["#c95757", "#57c959"])
+        green_to_red = red_to_green.reversed()
+        cmap = green_to_red if selected_habit.is_negative_habit else red_to_green
+        calmap.yearplot(daily_values, ax=ax, vmin=0, vmax=1, cmap=cmap, linewidth=3, fillcolor='#f0f0f0', linecolor='white')
+    else:
+        cmap = "Reds" if selected_habit.is_negative_habit else "Greens"
+        calmap.yearplot(daily_values, ax=ax, cmap=cmap, linewidth=3, fillcolor='#a8a8a8', linecolor='white')
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches="tight")
+    plt.close(fig)
+    return buffer.getvalue()
+
 
-st.pyplot(fig)
+heatmap_options = ("heatmap", "png", bool(selected_habit.is_binary_habit), bool(selected_habit.is_negative_habit))
+st.image(render_cache.get_or_render((selected_habit.id, db_ops.db_url, data_version, *heatmap_options), render_heatmap), use_container_width=True)
 # endregion
 
 # Raw Data
@@ -1,6 +1,9 @@
 import streamlit as st
 from datetime import date
 from src.database.utils import db_ops
+from src.database.instrumentation import begin_render
+
+begin_render("habit_log")
 
 st.title("📅 Daily Habit Log")
 
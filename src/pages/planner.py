@@ -0,0 +1,46 @@
+import streamlit as st
+from datetime import date
+from src.database.utils import db_ops
+from src.database.instrumentation import begin_render
+
+begin_render("planner")
+
+st.set_page_config(page_title="Planner", layout="wide")
+st.title("🗓️ Planner")
+
+VIEW_LIMIT = 50
+
+# Controls
+control_cols = st.columns(3)
+today = control_cols[0].date_input("Today", value=date.today())
+horizon = control_cols[1].slider("Upcoming days", min_value=1, max_value=30, value=7)
+if control_cols[2].button("Generate habit tasks", help="Create each habit's recurring tasks for the next 4 weeks"):
+    created = db_ops.generate_recurring_tasks(28, start=today)
+    st.success(f"Created {created} tasks" if created else "Habit tasks are already scheduled")
+
+agenda = db_ops.task_agenda(horizon, today=today, limit=VIEW_LIMIT)
+
+
+def task_checklist(tasks, heading: str, total: int | None = None) -> list[str]:
+    """Render `tasks` as checkboxes and return the ids of the checked ones."""
+    shown = f"{len(tasks)} of {total}" if total is not None and total > len(tasks) else len(tasks)
+    st.subheader(f"{heading} ({shown})")
+    if not tasks:
+        st.write("Nothing here.")
+    checked = []
+    for task in tasks:
+        label = f"{task.title} — due {task.due_date:%a %d %b}" + (f" · {task.xp} XP" if task.xp else "")
+        if st.checkbox(label, key=f"planner_{task.id}"):
+            checked.append(task.id)
+    return checked
+
+
+with st.form("planner_form"):
+    done = (
+        task_checklist(agenda.overdue, "⚠️ Overdue", agenda.overdue_count)
+        + task_checklist(agenda.due_today, "📌 Due today")
+        + task_checklist(agenda.upcoming, f"🔜 Next {horizon} days")
+    )
+    if st.form_submit_button("Mark done") and done:
+        db_ops.complete_tasks(done)
+        st.rerun()
@@ -0,0 +1,52 @@
+import streamlit as st
+from src.database.utils import db_ops
+from src.database.instrumentation import begin_render
+from src.database.search import SEARCH_SOURCES
+
+begin_render("search")
+
+st.set_page_config(page_title="Search", layout="wide")
+st.title("🔎 Search")
+
+PAGE_SIZE = 20
+KIND_ICONS = {"transaction": "💳", "task": "✅", "goal": "🎯", "habit": "🔁"}
+
+# Controls
+control_cols = st.columns([3, 2])
+query = control_cols[0].text_input("Search", placeholder="Transactions, tasks, goals, habits…")
+kinds = control_cols[1].multiselect(
+    "Only", options=[source.kind for source in SEARCH_SOURCES], format_func=lambda x: f"{KIND_ICONS[x]} {x.title()}"
+)
+
+# Start over from the first page whenever the search changes
+if st.session_state.get("search_key") != (query, tuple(kinds)):
+    st.session_state["search_key"] = (query, tuple(kinds))
+    st.session_state["search_offset"] = 0
+offset = st.session_state["search_offset"]
+
+if not query.strip():
+    st.write("Type a word or the start of one; every word must match.")
+    st.stop()
+
+page = db_ops.search(query, kinds or None, limit=PAGE_SIZE, offset=offset)
+
+# region Results
+if not page.results:
+    st.write("No matches.")
+for result in page.results:
+    st.markdown(f"{KIND_ICONS.get(result.kind, '')} **{result.kind.title()}** · {result.title}")
+    if result.snippet:
+        st.caption(result.snippet)
+# endregion
+
+# region Pagination
+nav_cols = st.columns([1, 1, 6])
+if nav_cols[0].button("← Previous", disabled=offset == 0):
+    st.session_state["search_offset"] = max(offset - PAGE_SIZE, 0)
+    st.rerun()
+if nav_cols[1].button("Next →", disabled=not page.has_more):
+    st.session_state["search_offset"] = offset + PAGE_SIZE
+    st.rerun()
+if page.results:
+    nav_cols[2].caption(f"Results {offset + 1}–{offset + len(page.results)}")
+# endregion
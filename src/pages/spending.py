@@ -0,0 +1,89 @@
+import streamlit as st
+from datetime import date, timedelta
+from src.database.utils import db_ops
+from src.database.instrumentation import begin_render
+
+begin_render("spending")
+
+st.set_page_config(page_title="Spending", layout="wide")
+st.title("💸 Spending")
+
+accounts = db_ops.list_accounts()
+if not accounts:
+    st.write("No accounts found. Please create an account first.")
+    st.stop()
+account_names = {account.id: account.name for account in accounts}
+
+# Controls
+control_cols = st.columns(4)
+start_date = control_cols[0].date_input("From", value=date.today().replace(day=1) - timedelta(days=365))
+end_date = control_cols[1].date_input("To", value=date.today())
+group_by = control_cols[2].selectbox(
+    "Group by", options=["tag", "account", None], format_func=lambda x: {"tag": "Tag", "account": "Account", None: "Total"}[x]
+)
+window = control_cols[3].slider("Rolling average (months)", min_value=1, max_value=12, value=3)
+account_filter = st.multiselect("Accounts", options=list(account_names.keys()), format_func=lambda x: account_names[x])
+if start_date > end_date:
+    st.error("'From' must be on or before 'To'.")
+    st.stop()
+
+# Only the monthly aggregates leave the database
+breakdown = db_ops.spending_by_month(start_date, end_date, group_by, account_filter or None, window)
+
+import pandas as pd  # deferred: only needed once there is data to chart
+import plotly.express as px
+
+# region Monthly breakdown
+st.subheader("Monthly spending")
+if breakdown.totals.size:
+    labels = [account_names.get(key, key) for key in breakdown.keys] if group_by == "account" else breakdown.keys
+    monthly_df = pd.DataFrame({
+        "Month": breakdown.months.astype("datetime64[ns]"),
+        "Group": labels,
+        "Spent": breakdown.totals,
+        "Rolling average": breakdown.rolling_average,
+    })
+    st.plotly_chart(px.bar(monthly_df, x="Month", y="Spent", color="Group"), use_container_width=True)
+    st.plotly_chart(
+        px.line(monthly_df, x="Month", y="Rolling average", color="Group", title=f"{window}-month rolling average"),
+        use_container_width=True,
+    )
+    totals = monthly_df.groupby("Group", as_index=False)["Spent"].sum().sort_values("Spent", ascending=False)
+    st.dataframe(totals.round(2), use_container_width=True, hide_index=True)
+else:
+    st.write("No spending in this period.")
+# endregion
+
+# region Budgets
+st.subheader("Budget vs. actual")
+with st.form("set_budget"):
+    budget_cols = st.columns(2)
+    budget_tag = budget_cols[0].selectbox("Tag", options=[tag.name for tag in db_ops.list_tags()], accept_new_options=True)
+    budget_limit = budget_cols[1].number_input("Monthly limit", min_value=0.0, step=10.0)
+    if st.form_submit_button("Save budget") and budget_tag:
+        db_ops.set_budget(budget_tag, budget_limit)
+        st.success(f"Budget for '{budget_tag}' set to {budget_limit:.2f}")
+
+budget_month = st.date_input("Month", value=date.today(), key="budget_month")
+report = db_ops.budget_vs_actual(budget_month)
+if report.tags.size:
+    budget_df = pd.DataFrame({
+        "Tag": report.tags,
+        "Budget": report.budgets,
+        "Actual": report.actual,
+        "Remaining": report.remaining,
+        "Used": report.used,
+    })
+    st.plotly_chart(
+        px.bar(budget_df, x="Tag", y=["Budget", "Actual"], barmode="group", title=f"{report.month:%B %Y}"),
+        use_container_width=True,
+    )
+    st.dataframe(
+        budget_df,
+        column_config={"Used": st.column_config.ProgressColumn("Used", min_value=0.0, max_value=1.0, format="percent")},
+        use_container_width=True,
+        hide_index=True,
+    )
+else:
+    st.write("No budgets yet. Set one above.")
+# endregion
@@ -1,13 +1,17 @@
+import io
 import streamlit as st
 from src.database.utils import db_ops, Account
-import pandas as pd
+from src.database.importer import import_statement, read_csv_statement, read_ofx_statement
+from src.database.instrumentation import begin_render
+
+begin_render("transactions")
 
 st.subheader("Transactions")
 
 # Create a new transaction
 accounts = db_ops.list_accounts()
+account_ids = {account.id: account.name for account in accounts}
 if accounts:
-    account_ids = {account.id: account.name for account in accounts}
     with st.form("create_transaction"):
         st.write("## Create a new transaction")
         account_id = st.selectbox("Account", options=list(account_ids.keys()), format_func=lambda x: account_ids[x])
@@ -21,25 +25,64 @@ if accounts:
             account = db_ops.db.get(Account, account_id)
             transaction = db_ops.create_transaction(account, amount, txn_date, description, tag_names)
             st.success(f"Transaction '{transaction.id}' created successfully")
+
+    # Bulk import a bank statement
+    with st.expander("Import bank statement (CSV/OFX)"):
+        import_account_id = st.selectbox("Import into", options=list(account_ids.keys()), format_func=lambda x: account_ids[x])
+        statement = st.file_uploader("Statement file", type=["csv", "ofx", "qfx"])
+        if statement is not None and st.button("Import"):
+            text_stream = io.TextIOWrapper(statement, encoding="utf-8", newline="")
+            reader = read_ofx_statement if statement.name.lower().endswith((".ofx", ".qfx")) else read_csv_statement
+            result = import_statement(db_ops, import_account_id, reader(text_stream))
+            st.success(f"Imported {result.imported} transactions, skipped {result.skipped} already imported")
 else:
     st.write("No accounts found. Please create an account first.")
 
-# List all transactions
+# List transactions, one page at a time
 st.write("## Transactions List")
-transactions = db_ops.list_transactions()
+PAGE_SIZE = 50
+
+filter_cols = st.columns(3)
+start_date = filter_cols[0].date_input("From", value=None)
+end_date = filter_cols[1].date_input("To", value=None)
+account_filter = filter_cols[2].multiselect(
+    "Accounts", options=[account.id for account in accounts], format_func=lambda x: account_ids[x]
+)
+
+# Keyset cursors of the pages seen so far; reset whenever the filters change
+filters = (start_date, end_date, tuple(account_filter))
+if st.session_state.get("txn_filters") != filters:
+    st.session_state["txn_filters"] = filters
+    st.session_state["txn_cursors"] = [None]
+cursors = st.session_state["txn_cursors"]
+
+transactions = db_ops.list_transactions_page(
+    limit=PAGE_SIZE,
+    after=cursors[-1],
+    start_date=start_date,
+    end_date=end_date,
+    account_ids=account_filter or None,
+)
 if transactions:
-    data = []
-    for transaction in transactions:
-        account = db_ops.db.get(Account, transaction.account_id)
-        tags = ', '.join([tag.name for tag in transaction.tags])
-        data.append({
-            'Account': account.name,
+    import pandas as pd  # deferred: only needed once there are rows to show
+    df = pd.DataFrame([
+        {
+            'Account': transaction.account.name,
             'Amount': transaction.amount,
             'Date': transaction.date,
             'Description': transaction.description,
-            'Tags': tags
-        })
-    df = pd.DataFrame(data)
+            'Tags': ', '.join(tag.name for tag in transaction.tags)
+        }
+        for transaction in transactions
+    ])
     st.write(df)
 else:
     st.write("No transactions found.")
+
+prev_col, next_col = st.columns(2)
+if prev_col.button("Previous page", disabled=len(cursors) == 1):
+    cursors.pop()
+    st.rerun()
+if next_col.button("Next page", disabled=len(transactions) < PAGE_SIZE):
+    cursors.append((transactions[-1].date, transactions[-1].id))
+    st.rerun()
@@ -0,0 +1,82 @@
+import logging
+logger = logging.getLogger(__name__)
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from src.database.utils import add_habit_logs_listener
+
+RENDER_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RENDER_CACHE_MAX_ENTRIES = 512
+
+
+class RenderCache:
+    """
+    Size-bounded LRU of rendered chart output (PNG/SVG bytes or figure JSON).
+
+    Keys are tuples starting with the habit id, followed by the database URL,
+    the habit's data version and the chart options, so a changed habit never
+    hits a stale entry and tenants never share one; invalidate_habits drops
+    those entries eagerly to free the space.
+    """
+
+    def __init__(self, max_bytes: int = RENDER_CACHE_MAX_BYTES, max_entries: int = RENDER_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, bytes | str] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: tuple[Hashable, ...], render: Callable[[], bytes | str]) -> bytes | str:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Render outside the lock; two threads may race to render the same key
+        value = render()
+        self._put(key, value)
+        return value
+
+    def _put(self, key: tuple, value: bytes | str):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self._size += size
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate_habits(self, habit_ids: set[str]):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] in habit_ids]
+            for key in stale:
+                self._size -= len(self._entries.pop(key))
+        if stale:
+            logger.debug("Dropped %s cached renders for %s habit(s)", len(stale), len(habit_ids))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+render_cache = RenderCache()
+# Hooks up every DbOps (prod and tenants) without opening a database at import
+add_habit_logs_listener(render_cache.invalidate_habits)